@@ -0,0 +1,31 @@
+import asyncio
+from typing import Optional
+import aiohttp
+import together
+from together import AsyncTogether
+from app.config.settings import settings
+
+# One Together client per process, shared by the chat and insight services
+together_client = AsyncTogether(api_key=settings.together_api_key)
+
+# Bounds in-flight LLM calls across all requests to stay under Together's rate limits
+llm_semaphore = asyncio.Semaphore(settings.max_concurrent_llm_calls)
+
+# The SDK opens a new aiohttp session per call unless together.aiosession holds one,
+# so this session is what keeps LLM connections alive between calls
+_llm_http_session: Optional[aiohttp.ClientSession] = None
+
+async def open_llm_session():
+    global _llm_http_session
+    if _llm_http_session is None or _llm_http_session.closed:
+        connector = aiohttp.TCPConnector(limit_per_host=settings.max_concurrent_llm_calls)
+        _llm_http_session = aiohttp.ClientSession(connector=connector)
+
+async def close_llm_session():
+    if _llm_http_session is not None:
+        await _llm_http_session.close()
+
+def use_llm_session():
+    """Point the SDK at the shared session; aiosession is a ContextVar, so set it in each request's context"""
+    if _llm_http_session is not None:
+        together.aiosession.set(_llm_http_session)
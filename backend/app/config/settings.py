@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from functools import cached_property
+from typing import FrozenSet, List, Optional
 
 class Settings(BaseSettings):
     supabase_url: str
@@ -9,11 +10,18 @@ class Settings(BaseSettings):
     max_file_size: int
     allowed_origins: str  # Comma-separated string
     together_api_key: str
+    max_concurrent_llm_calls: int = 16
+    # Supavisor transaction-mode DSN (port 6543); when set, hot lookups skip PostgREST
+    database_url: Optional[str] = None
 
-    @property
+    @cached_property
     def allowed_origins_list(self) -> List[str]:
         return self.allowed_origins.split(",")
 
+    @cached_property
+    def allowed_file_types_set(self) -> FrozenSet[str]:
+        return frozenset(self.allowed_file_types.split(","))
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
@@ -1,38 +1,97 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response, StreamingResponse
+from fastapi.responses import Response, StreamingResponse, JSONResponse, ORJSONResponse
 from pydantic import BaseModel
+from typing import AsyncIterator, List, Optional
 from app.config.settings import settings
 from app.utils.logger import logger
 from app.services.supabase_service import SupabaseService
+from app.clients import open_llm_session, close_llm_session, use_llm_session
 from app.utils.auth import get_current_user
 from app.services.parser_service import ParserService
 from app.services.langgraph_service import LangGraphService
 from app.services.chat_service import ChatService
 from app.services.pdf_export_service import PDFExportService 
-import io
+import asyncio
+import json
+import re
 
-app = FastAPI(title="AI Analyst Backend", version="1.0.0")
+# orjson serializes the insight payloads (and any stray numpy scalars) natively
+app = FastAPI(title="AI Analyst Backend", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins_list,
     allow_credentials=True,
-    allow_methods=["GET", "POST", "DETETE", "OPTIONS"],
+    allow_methods=["GET", "POST", "DELETE", "OPTIONS"],
     allow_headers=["Authorization", "Content-Type"],
 )
 
+# Allowance for multipart boundaries and part headers on top of the file itself
+UPLOAD_MULTIPART_OVERHEAD = 64 * 1024
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    """Reject uploads by Content-Length before the body is read and spooled"""
+    max_files = {"/upload": 1, "/upload/batch": MAX_BATCH_UPLOAD_FILES}.get(request.url.path)
+    if max_files:
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and \
+                int(content_length) > max_files * (settings.max_file_size + UPLOAD_MULTIPART_OVERHEAD):
+            logger.warning("Rejected oversized upload", content_length=int(content_length))
+            return JSONResponse(status_code=413, content={"detail": "File size exceeds limit"})
+    return await call_next(request)
+
+@app.middleware("http")
+async def share_llm_session(request: Request, call_next):
+    """Set the pooled Together session in this request's context before the endpoint runs"""
+    use_llm_session()
+    return await call_next(request)
+
 supabase_service = SupabaseService()
 parser_service = ParserService()
 langgraph_service = LangGraphService()
 chat_service = ChatService()
 pdf_export_service = PDFExportService()
 
+@app.on_event("startup")
+async def startup():
+    await open_llm_session()
+    await supabase_service.connect()
+    await supabase_service.warm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await parser_service.close()
+    await close_llm_session()
+    await supabase_service.close()
+
 class ChatRequest(BaseModel):
     file_id: str
     question: str
 
+class DirectUploadRequest(BaseModel):
+    file_name: str
+    file_size: int
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Files accepted by one /upload/batch request
+MAX_BATCH_UPLOAD_FILES = 10
+
+# Characters stripped from file names before they go into a download header
+_UNSAFE = re.compile(r"[^A-Za-z0-9 _-]+")
+
+async def _iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    """Read an upload in fixed-size chunks so it can be streamed onward, aborting past the size limit"""
+    bytes_read = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        bytes_read += len(chunk)
+        if bytes_read > settings.max_file_size:
+            raise HTTPException(status_code=413, detail="File size exceeds limit")
+        yield chunk
+
 @app.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
@@ -41,38 +100,124 @@ async def upload_file(
     try:
         # Validate file type
         file_ext = file.filename.split(".")[-1].lower()
-        allowed_types = settings.allowed_file_types.split(",")
-        if file_ext not in allowed_types:
-            raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {allowed_types}")
+        if file_ext not in settings.allowed_file_types_set:
+            raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {sorted(settings.allowed_file_types_set)}")
 
-        # Validate file size
-        file_content = await file.read()
-        if len(file_content) > settings.max_file_size:
-            raise HTTPException(status_code=400, detail="File size exceeds limit")
+        # Validate file size (when unknown, _iter_upload enforces the limit while streaming)
+        if file.size is not None and file.size > settings.max_file_size:
+            raise HTTPException(status_code=413, detail="File size exceeds limit")
 
-        # Upload to Supabase
-        file_url = await supabase_service.upload_file(file_content, file.filename, user_id)
+        # Stream to Supabase without reading the whole file into memory
+        file_url = await supabase_service.upload_file(
+            _iter_upload(file), file.filename, user_id, file_size=file.size
+        )
 
         # Save metadata
         result = await supabase_service.save_file_metadata(
             file_name=file.filename,
             file_url=file_url,
             user_id=user_id,
-            file_size=len(file_content),
+            file_size=file.size,
             file_type=file_ext
         )
         
         logger.info("File processed successfully", file_name=file.filename, user_id=user_id)
         return {"file_url": file_url, "file_id": result[0]["id"]}
+    except HTTPException as e:
+        raise e
     except Exception as e:
         logger.error("Error processing file", error=str(e), file_name=file.filename)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/upload/batch")
+async def upload_files(
+    files: List[UploadFile] = File(...),
+    user_id: str = Depends(get_current_user)
+):
+    """Upload several files and save their metadata with a single insert"""
+    try:
+        if len(files) > MAX_BATCH_UPLOAD_FILES:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_UPLOAD_FILES} files per upload")
+        # Reject the whole batch up front rather than after some files are stored
+        seen_names = set()
+        file_exts = [_validate_upload(file.filename, file.size or 0, seen_names) for file in files]
+
+        results = await asyncio.gather(*(
+            supabase_service.upload_file(_iter_upload(file), file.filename, user_id, file_size=file.size)
+            for file in files
+        ), return_exceptions=True)
+        stored_names = [file.filename for file, result in zip(files, results) if not isinstance(result, BaseException)]
+        errors = [result for result in results if isinstance(result, BaseException)]
+
+        # All or nothing: a partly stored batch would leave objects with no metadata rows
+        try:
+            if errors:
+                raise errors[0]
+            result = await supabase_service.save_file_metadata_bulk(user_id, [
+                {"file_name": file.filename, "file_url": file_url, "file_size": file.size, "file_type": file_ext}
+                for file, file_url, file_ext in zip(files, results, file_exts)
+            ])
+        except BaseException:
+            await supabase_service.remove_files(user_id, stored_names)
+            raise
+
+        logger.info("Files processed successfully", file_count=len(files), user_id=user_id)
+        return {"files": [{"file_url": row["file_path"], "file_id": row["id"]} for row in result]}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error("Error processing files", error=str(e), file_count=len(files))
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _validate_upload(file_name: str, file_size: int, seen_names: Optional[set] = None) -> str:
+    # Names map to storage keys and the (user_id, filename) upsert, so a batch can't repeat one
+    if seen_names is not None:
+        if file_name in seen_names:
+            raise HTTPException(status_code=400, detail=f"Duplicate file name in upload: {file_name}")
+        seen_names.add(file_name)
+    file_ext = file_name.split(".")[-1].lower()
+    if file_ext not in settings.allowed_file_types_set:
+        raise HTTPException(status_code=400, detail=f"Invalid file type. Allowed: {sorted(settings.allowed_file_types_set)}")
+    if file_size > settings.max_file_size:
+        raise HTTPException(status_code=413, detail="File size exceeds limit")
+    return file_ext
+
+@app.post("/upload/url")
+async def create_upload_url(request: DirectUploadRequest, user_id: str = Depends(get_current_user)):
+    """First step of a direct upload: the client PUTs the file to the returned URL, then calls /upload/complete"""
+    _validate_upload(request.file_name, request.file_size)
+    return await supabase_service.create_upload_url(request.file_name, user_id)
+
+@app.post("/upload/complete")
+async def complete_upload(request: DirectUploadRequest, user_id: str = Depends(get_current_user)):
+    try:
+        file_ext = _validate_upload(request.file_name, request.file_size)
+        file_url = await supabase_service.complete_upload(request.file_name, user_id, request.file_size)
+        result = await supabase_service.save_file_metadata(
+            file_name=request.file_name,
+            file_url=file_url,
+            user_id=user_id,
+            file_size=request.file_size,
+            file_type=file_ext
+        )
+
+        logger.info("Direct upload completed", file_name=request.file_name, user_id=user_id)
+        return {"file_url": file_url, "file_id": result[0]["id"]}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error("Error completing upload", error=str(e), file_name=request.file_name)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/files")
-async def list_files(user_id: str = Depends(get_current_user)):
+async def list_files(
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=100),
+    user_id: str = Depends(get_current_user)
+):
     try:
-        files = await supabase_service.list_user_files(user_id)
-        return {"files": files}
+        page = await supabase_service.list_user_files(user_id, cursor=cursor, limit=limit)
+        return {"files": page["items"], "next_cursor": page["next_cursor"]}
     except Exception as e:
         logger.error("Error listing files", error=str(e), user_id=user_id)
         raise HTTPException(status_code=500, detail=str(e))
@@ -96,8 +241,10 @@ async def analyze_file(file_id: str, user_id: str = Depends(get_current_user)):
         if file["status"] in ["processing", "analyzed"]:
             raise HTTPException(status_code=400, detail=f"File is already {file['status']}")
 
-        # Update status to processing
-        await supabase_service.update_file_status(file_id, user_id, "processing")
+        # Update status to processing in the background; parsing doesn't depend on it
+        status_task = asyncio.create_task(
+            supabase_service.update_file_status(file_id, user_id, "processing")
+        )
 
         try:
             # Parse spreadsheet (now returns computed insights too)
@@ -106,7 +253,7 @@ async def analyze_file(file_id: str, user_id: str = Depends(get_current_user)):
             )
 
             # Generate AI insights using LangGraph (trends, anomalies, predictions)
-            ai_insights = await langgraph_service.generate_insights(raw_text, description)
+            ai_insights = await langgraph_service.generate_insights(raw_text, description, computed_insights)
             
             # Combine computed insights with AI insights
             all_insights = {
@@ -114,14 +261,19 @@ async def analyze_file(file_id: str, user_id: str = Depends(get_current_user)):
                 **ai_insights         # AI-generated trends/predictions
             }
 
-            # Save analysis results
+            # Surface any failure of the processing status update
+            await status_task
+
+            # Save analysis results, then mark the file analyzed; marking it first could leave
+            # an "analyzed" file with no analysis row if the save fails
             analysis_result = await supabase_service.save_analysis_result(
                 file_id, user_id, raw_text, description, all_insights
             )
-
-            # Update file status to analyzed
             await supabase_service.update_file_status(file_id, user_id, "analyzed")
 
+            # Cached chat answers refer to the previous analysis
+            chat_service.invalidate_cache(file_id)
+
             logger.info("File analyzed successfully", file_id=file_id, user_id=user_id)
             return {
                 "file_id": file_id,
@@ -129,6 +281,8 @@ async def analyze_file(file_id: str, user_id: str = Depends(get_current_user)):
                 "status": "analyzed"
             }
         except Exception as e:
+            # Let the processing update land first so it can't overwrite the error status
+            await asyncio.gather(status_task, return_exceptions=True)
             # Update status to error on failure
             await supabase_service.update_file_status(file_id, user_id, "error")
             raise
@@ -152,14 +306,14 @@ async def get_analysis(file_id: str, user_id: str = Depends(get_current_user)):
 @app.post("/chat")
 async def chat(request: ChatRequest, user_id: str = Depends(get_current_user)):
     try:
-        # Get analysis data
-        analysis = await supabase_service.get_analysis_by_file_id(request.file_id, user_id)
+        # Get analysis data and chat history concurrently
+        analysis, chat_history = await asyncio.gather(
+            supabase_service.get_analysis_insights_by_file_id(request.file_id, user_id),
+            supabase_service.get_chat_history(request.file_id, user_id)
+        )
         if not analysis:
             raise HTTPException(status_code=404, detail="Analysis not found for this file")
 
-        # Get chat history
-        chat_history = await supabase_service.get_chat_history(request.file_id, user_id)
-
         # Generate answer
         answer = await chat_service.process_chat(
             file_id=request.file_id,
@@ -186,6 +340,44 @@ async def chat(request: ChatRequest, user_id: str = Depends(get_current_user)):
         logger.error("Error processing chat", error=str(e), file_id=request.file_id, user_id=user_id)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, user_id: str = Depends(get_current_user)):
+    """Stream the answer as server-sent events, then persist it to chat history"""
+    analysis, chat_history = await asyncio.gather(
+        supabase_service.get_analysis_insights_by_file_id(request.file_id, user_id),
+        supabase_service.get_chat_history(request.file_id, user_id)
+    )
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Analysis not found for this file")
+
+    async def event_stream():
+        answer_parts = []
+        try:
+            async for delta in chat_service.process_chat_stream(
+                file_id=request.file_id,
+                user_id=user_id,
+                question=request.question,
+                analysis_data=analysis,
+                chat_history=chat_history
+            ):
+                answer_parts.append(delta)
+                yield f"data: {json.dumps({'delta': delta})}\n\n"
+
+            await supabase_service.save_chat_history(
+                file_id=request.file_id,
+                analysis_id=analysis["id"],
+                user_id=user_id,
+                question=request.question,
+                answer="".join(answer_parts).strip()
+            )
+            logger.info("Chat response streamed", file_id=request.file_id, user_id=user_id)
+            yield f"data: {json.dumps({'done': True})}\n\n"
+        except Exception as e:
+            logger.error("Error streaming chat", error=str(e), file_id=request.file_id, user_id=user_id)
+            yield f"data: {json.dumps({'error': 'Chat processing error'})}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/chat/history/{file_id}")
 async def get_chat_history(file_id: str, user_id: str = Depends(get_current_user)):
     try:
@@ -217,7 +409,7 @@ async def export_pdf_report(
             raise HTTPException(status_code=400, detail="File must be analyzed before exporting to PDF")
 
         # Get analysis data
-        analysis = await supabase_service.get_analysis_by_file_id(file_id, user_id)
+        analysis = await supabase_service.get_analysis_insights_by_file_id(file_id, user_id)
         if not analysis or not analysis.get("insights"):
             raise HTTPException(status_code=404, detail="No analysis insights found for this file")
         
@@ -247,7 +439,7 @@ async def export_pdf_report(
         )
 
         # Create filename for download
-        safe_filename = "".join(c for c in file_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        safe_filename = _UNSAFE.sub("", file_name).rstrip()
         if not safe_filename:  # Fallback if filename cleaning results in empty string
             safe_filename = f"Analysis_{file_id[:8]}"
         pdf_filename = f"{safe_filename}_Analysis_Report.pdf"
@@ -257,10 +449,9 @@ async def export_pdf_report(
         logger.info("PDF report generated successfully", 
                    file_id=file_id, user_id=user_id, pdf_size=len(pdf_content))
 
-        # Return PDF as downloadable response using StreamingResponse
-        pdf_stream = io.BytesIO(pdf_content)
-        return StreamingResponse(
-            io.BytesIO(pdf_content),
+        # The PDF is already fully in memory, so return the bytes directly without another copy
+        return Response(
+            content=pdf_content,
             media_type="application/pdf",
             headers={
                 "Content-Disposition": f"attachment; filename={pdf_filename}",
@@ -278,6 +469,7 @@ async def export_pdf_report(
 async def delete_file(file_id: str, user_id: str = Depends(get_current_user)):
     try:
         await supabase_service.delete_file(file_id, user_id)
+        chat_service.invalidate_cache(file_id)
         logger.info("File deleted successfully", file_id=file_id, user_id=user_id)
         return {"message": "File and associated data deleted successfully"}
     except HTTPException as e:
@@ -1,141 +1,214 @@
-from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Dict
+from typing import List, Dict, AsyncIterator
 from app.utils.logger import logger
 from fastapi import HTTPException
-from together import AsyncTogether
-from app.config.settings import settings
-import json
-
-class ChatState(TypedDict):
-    file_id: str
-    user_id: str
-    question: str
-    analysis_data: Dict
-    chat_history: List[Dict[str, str]]
-    answer: str
+from app.clients import together_client, llm_semaphore
+from collections import OrderedDict
+import hashlib
+import time
+
+# Built once at import. The invariant instructions live in the system message so
+# the provider can reuse the cached prefix; only the user message changes per call.
+CHAT_SYSTEM_PROMPT = """
+You are an AI business analyst. Answer the user's question using the provided computed data and insights.
+Give direct, specific answers with actual numbers when available. Don't suggest how to calculate things - use the computed results.
+
+Instructions:
+- Use specific numbers and names from the computed data
+- Be concise and direct
+- If the exact answer isn't in the data, say so and provide the closest relevant information
+- Format currency values clearly (e.g., $1,234.56)
+- Don't suggest calculations or code - use the provided computed results
+"""
+
+CHAT_USER_PROMPT = """
+Available Data:
+{context}
+
+Question: {question}
+"""
+
+# Answers are reused for repeated questions against the same analysis
+ANSWER_CACHE_TTL_SECONDS = 3600
+ANSWER_CACHE_MAX_ENTRIES = 1024
+
+# Formatted insight blocks only change when a file is re-analyzed
+CONTEXT_CACHE_MAX_ENTRIES = 256
 
 class ChatService:
     def __init__(self):
-        self.client = AsyncTogether(api_key=settings.together_api_key)
+        self.client = together_client
+        self._answer_cache: OrderedDict = OrderedDict()
+        self._context_cache: OrderedDict = OrderedDict()
+
+    def _get_analysis_context(self, analysis_data: Dict) -> str:
+        """Return the formatted insight block for an analysis, formatting it once per analysis"""
+        # file_id first so invalidate_cache can drop a file's entries; a re-analysis upserts the same id
+        key = (analysis_data.get('file_id'), analysis_data.get('id'), analysis_data.get('created_at'))
+        context = self._context_cache.get(key)
+        if context is None:
+            context = self._format_analysis_context(analysis_data)
+            self._context_cache[key] = context
+            while len(self._context_cache) > CONTEXT_CACHE_MAX_ENTRIES:
+                self._context_cache.popitem(last=False)
+        else:
+            self._context_cache.move_to_end(key)
+        return context
+
+    def _format_analysis_context(self, analysis_data: Dict) -> str:
+        # Extract computed insights for direct answers
+        insights = analysis_data.get('insights', {})
+        
+        # Build context with computed data
+        context_parts = [
+            f"Spreadsheet Description: {analysis_data['description']}"
+        ]
+        
+        # Add specific computed insights
+        if 'top_sales_reps' in insights:
+            best_rep = insights['top_sales_reps']['best_performer']
+            context_parts.append(f"Best Sales Rep: {best_rep['name']} with ${best_rep['total_sales']:,.2f} in total sales ({best_rep['transactions']} transactions)")
+            
+            all_reps = insights['top_sales_reps']['all_reps']
+            reps_summary = ", ".join([f"{rep['name']}: ${rep['total_sales']:,.2f}" for rep in all_reps[:5]])
+            context_parts.append(f"All Sales Reps Performance: {reps_summary}")
+
+        if 'top_products' in insights:
+            top_products = insights['top_products'][:5]
+            products_summary = ", ".join([f"{prod['name']}: ${prod['total_revenue']:,.2f}" for prod in top_products])
+            context_parts.append(f"Top Products: {products_summary}")
+
+        if 'top_customers' in insights:
+            top_customers = insights['top_customers'][:5]
+            customers_summary = ", ".join([f"{cust['name']}: ${cust['total_spent']:,.2f}" for cust in top_customers])
+            context_parts.append(f"Top Customers: {customers_summary}")
+
+        if 'revenue_by_category' in insights:
+            categories = insights['revenue_by_category'][:5]
+            categories_summary = ", ".join([f"{cat['category']}: ${cat['revenue']:,.2f}" for cat in categories])
+            context_parts.append(f"Revenue by Category: {categories_summary}")
+
+        if 'regional_performance' in insights:
+            regions = insights['regional_performance'][:5]
+            regions_summary = ", ".join([f"{reg['region']}: ${reg['total_revenue']:,.2f}" for reg in regions])
+            context_parts.append(f"Regional Performance: {regions_summary}")
+
+        if 'total_revenue' in insights:
+            context_parts.append(f"Total Revenue: ${insights['total_revenue']:,.2f}")
+            context_parts.append(f"Average Transaction: ${insights['average_transaction']:,.2f}")
+            context_parts.append(f"Total Transactions: {insights['total_transactions']:,}")
+
+        if 'monthly_trends' in insights:
+            recent_months = insights['monthly_trends'][-3:]  # Last 3 months
+            trends_summary = ", ".join([f"{month['month']}: ${month['revenue']:,.2f}" for month in recent_months])
+            context_parts.append(f"Recent Monthly Revenue: {trends_summary}")
+
+        if 'monthly_growth_rate' in insights:
+            growth = insights['monthly_growth_rate']
+            context_parts.append(f"Monthly Growth Rate: {growth:+.1f}%")
+
+        # Add AI-generated insights
+        if 'trends' in insights:
+            context_parts.append(f"Identified Trends: {', '.join(insights['trends'])}")
+        if 'anomalies' in insights:
+            context_parts.append(f"Anomalies: {', '.join(insights['anomalies'])}")
+        if 'predictions' in insights:
+            context_parts.append(f"Predictions: {', '.join(insights['predictions'])}")
+
+        return "\n\n".join(context_parts)
+
+    def _build_messages(self, question: str, analysis_data: Dict, chat_history: List[Dict[str, str]]) -> list:
+        # Only the conversation and question change between turns
+        context = f"{self._get_analysis_context(analysis_data)}\n\nPrevious Conversation: {self._format_chat_history(chat_history)}"
+
+        prompt = CHAT_USER_PROMPT.format(context=context, question=question)
+
+        return [
+            {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _answer_cache_key(self, file_id: str, user_id: str, question: str, analysis_data: Dict) -> tuple:
+        """Key on file_id so entries can be dropped per file; the digest covers the analysis and question"""
+        normalized_question = " ".join(question.strip().lower().split())
+        digest = hashlib.sha256(
+            f"{user_id}:{analysis_data.get('id')}:{analysis_data.get('created_at')}:{normalized_question}".encode()
+        ).hexdigest()
+        return (file_id, digest)
+
+    def _get_cached_answer(self, key: tuple):
+        entry = self._answer_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, answer = entry
+        if expires_at < time.monotonic():
+            del self._answer_cache[key]
+            return None
+        self._answer_cache.move_to_end(key)
+        return answer
+
+    def _set_cached_answer(self, key: tuple, answer: str):
+        self._answer_cache[key] = (time.monotonic() + ANSWER_CACHE_TTL_SECONDS, answer)
+        self._answer_cache.move_to_end(key)
+        while len(self._answer_cache) > ANSWER_CACHE_MAX_ENTRIES:
+            self._answer_cache.popitem(last=False)
+
+    def invalidate_cache(self, file_id: str):
+        """Drop cached answers and context for a file, e.g. after it is re-analyzed"""
+        for cache in (self._answer_cache, self._context_cache):
+            for key in [key for key in cache if key[0] == file_id]:
+                del cache[key]
 
     async def process_chat(self, file_id: str, user_id: str, question: str, analysis_data: Dict, chat_history: List[Dict[str, str]]) -> str:
         try:
-            # Define the LangGraph workflow
-            workflow = StateGraph(ChatState)
-
-            # Node to generate answer
-            async def generate_answer(state: ChatState) -> ChatState:
-                # Extract computed insights for direct answers
-                insights = state['analysis_data'].get('insights', {})
-                
-                # Build context with computed data
-                context_parts = [
-                    f"Spreadsheet Description: {state['analysis_data']['description']}",
-                    f"Previous Conversation: {self._format_chat_history(state['chat_history'])}"
-                ]
-                
-                # Add specific computed insights
-                if 'top_sales_reps' in insights:
-                    best_rep = insights['top_sales_reps']['best_performer']
-                    context_parts.append(f"Best Sales Rep: {best_rep['name']} with ${best_rep['total_sales']:,.2f} in total sales ({best_rep['transactions']} transactions)")
-                    
-                    all_reps = insights['top_sales_reps']['all_reps']
-                    reps_summary = ", ".join([f"{rep['name']}: ${rep['total_sales']:,.2f}" for rep in all_reps[:5]])
-                    context_parts.append(f"All Sales Reps Performance: {reps_summary}")
-
-                if 'top_products' in insights:
-                    top_products = insights['top_products'][:5]
-                    products_summary = ", ".join([f"{prod['name']}: ${prod['total_revenue']:,.2f}" for prod in top_products])
-                    context_parts.append(f"Top Products: {products_summary}")
-
-                if 'top_customers' in insights:
-                    top_customers = insights['top_customers'][:5]
-                    customers_summary = ", ".join([f"{cust['name']}: ${cust['total_spent']:,.2f}" for cust in top_customers])
-                    context_parts.append(f"Top Customers: {customers_summary}")
-
-                if 'revenue_by_category' in insights:
-                    categories = insights['revenue_by_category'][:5]
-                    categories_summary = ", ".join([f"{cat['category']}: ${cat['revenue']:,.2f}" for cat in categories])
-                    context_parts.append(f"Revenue by Category: {categories_summary}")
-
-                if 'regional_performance' in insights:
-                    regions = insights['regional_performance'][:5]
-                    regions_summary = ", ".join([f"{reg['region']}: ${reg['total_revenue']:,.2f}" for reg in regions])
-                    context_parts.append(f"Regional Performance: {regions_summary}")
-
-                if 'total_revenue' in insights:
-                    context_parts.append(f"Total Revenue: ${insights['total_revenue']:,.2f}")
-                    context_parts.append(f"Average Transaction: ${insights['average_transaction']:,.2f}")
-                    context_parts.append(f"Total Transactions: {insights['total_transactions']:,}")
-
-                if 'monthly_trends' in insights:
-                    recent_months = insights['monthly_trends'][-3:]  # Last 3 months
-                    trends_summary = ", ".join([f"{month['month']}: ${month['revenue']:,.2f}" for month in recent_months])
-                    context_parts.append(f"Recent Monthly Revenue: {trends_summary}")
-
-                if 'monthly_growth_rate' in insights:
-                    growth = insights['monthly_growth_rate']
-                    context_parts.append(f"Monthly Growth Rate: {growth:+.1f}%")
-
-                # Add AI-generated insights
-                if 'trends' in insights:
-                    context_parts.append(f"Identified Trends: {', '.join(insights['trends'])}")
-                if 'anomalies' in insights:
-                    context_parts.append(f"Anomalies: {', '.join(insights['anomalies'])}")
-                if 'predictions' in insights:
-                    context_parts.append(f"Predictions: {', '.join(insights['predictions'])}")
-
-                context = "\n\n".join(context_parts)
-
-                prompt = f"""
-                You are an AI business analyst. Answer the user's question using the provided computed data and insights. 
-                Give direct, specific answers with actual numbers when available. Don't suggest how to calculate things - use the computed results.
-
-                Available Data:
-                {context}
-
-                Question: {state['question']}
-
-                Instructions:
-                - Use specific numbers and names from the computed data
-                - Be concise and direct
-                - If the exact answer isn't in the data, say so and provide the closest relevant information
-                - Format currency values clearly (e.g., $1,234.56)
-                - Don't suggest calculations or code - use the provided computed results
-                """
+            cache_key = self._answer_cache_key(file_id, user_id, question, analysis_data)
+            cached_answer = self._get_cached_answer(cache_key)
+            if cached_answer is not None:
+                logger.info("Chat answer served from cache", file_id=file_id, user_id=user_id)
+                return cached_answer
 
+            async with llm_semaphore:
                 response = await self.client.chat.completions.create(
                     model="mistralai/Mixtral-8x7B-Instruct-v0.1",
-                    messages=[{"role": "user", "content": prompt}],
+                    messages=self._build_messages(question, analysis_data, chat_history),
                     max_tokens=300
                 )
-                answer = response.choices[0].message.content.strip()
-                state["answer"] = answer
-                logger.info("Generated chat answer", file_id=state["file_id"], question=state["question"])
-                return state
-
-            # Add node
-            workflow.add_node("generate_answer", generate_answer)
-            workflow.set_entry_point("generate_answer")
-            workflow.add_edge("generate_answer", END)
-
-            # Compile and run
-            graph = workflow.compile()
-            initial_state = ChatState(
-                file_id=file_id,
-                user_id=user_id,
-                question=question,
-                analysis_data=analysis_data,
-                chat_history=chat_history,
-                answer=""
-            )
-            result = await graph.ainvoke(initial_state)
+            answer = response.choices[0].message.content.strip()
+            logger.info("Generated chat answer", file_id=file_id, question=question)
 
-            return result["answer"]
+            self._set_cached_answer(cache_key, answer)
+            return answer
         except Exception as e:
             logger.error("Failed to process chat", error=str(e), file_id=file_id, user_id=user_id)
             raise HTTPException(status_code=500, detail=f"Chat processing error: {str(e)}")
 
+    async def process_chat_stream(self, file_id: str, user_id: str, question: str, analysis_data: Dict, chat_history: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Yield answer text deltas as the model produces them"""
+        cache_key = self._answer_cache_key(file_id, user_id, question, analysis_data)
+        cached_answer = self._get_cached_answer(cache_key)
+        if cached_answer is not None:
+            logger.info("Chat answer served from cache", file_id=file_id, user_id=user_id)
+            yield cached_answer
+            return
+
+        answer_parts = []
+        # Hold the slot for the whole stream; the request is in flight until the last token
+        async with llm_semaphore:
+            stream = await self.client.chat.completions.create(
+                model="mistralai/Mixtral-8x7B-Instruct-v0.1",
+                messages=self._build_messages(question, analysis_data, chat_history),
+                max_tokens=300,
+                stream=True
+            )
+
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    answer_parts.append(delta)
+                    yield delta
+
+        self._set_cached_answer(cache_key, "".join(answer_parts).strip())
+        logger.info("Streamed chat answer", file_id=file_id, question=question)
+
     def _format_chat_history(self, chat_history: List[Dict[str, str]]) -> str:
         if not chat_history:
             return "No previous conversation."
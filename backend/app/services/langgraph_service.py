@@ -1,206 +1,306 @@
-from langgraph.graph import StateGraph, END
-from typing import TypedDict, Dict, Any
+from langgraph.graph import StateGraph, START, END
+from langgraph.cache.memory import InMemoryCache
+from langgraph.types import CachePolicy
+from typing import TypedDict, Dict, Any, Annotated, List, Mapping, Optional
 from app.utils.logger import logger
 from fastapi import HTTPException
-from together import AsyncTogether
-from app.config.settings import settings
+from app.clients import together_client, llm_semaphore
+import hashlib
 import json
+import operator
+
+# Prompt templates are built once at import. The task instructions go in a static
+# system message ahead of the data so the provider can reuse the cached prefix;
+# only the user message carrying the data slice changes per call.
+TRENDS_SYSTEM_PROMPT = """
+Analyze the spreadsheet data provided by the user to identify 2-3 key business trends.
+
+Return a JSON object with a 'trends' key containing a list of trend descriptions.
+Example: {"trends": ["Sales increased by 15% month-over-month", "Technology products show highest growth"]}
+"""
+
+ANOMALIES_SYSTEM_PROMPT = """
+Analyze the data provided by the user to identify 1-2 anomalies or unusual patterns.
+
+Return a JSON object with an 'anomalies' key containing a list of anomaly descriptions.
+Example: {"anomalies": ["Unusually high returns in March", "Spike in weekend sales"]}
+"""
+
+PREDICTIONS_SYSTEM_PROMPT = """
+Based on the data provided by the user, generate 1-2 business predictions or recommendations.
+
+Return a JSON object with a 'predictions' key containing a list of predictions.
+Example: {"predictions": ["Expect 10% growth next quarter", "Consider expanding top-performing regions"]}
+"""
+
+DATA_PROMPT = """
+Data Sample:
+{raw_text}
+
+Description:
+{description}
+"""
+
+# Placeholders for insights the graph could not produce
+FALLBACK_INSIGHTS = {
+    "trends": ["Unable to analyze trends due to technical error"],
+    "anomalies": ["Unable to analyze anomalies due to technical error"],
+    "predictions": ["Unable to generate predictions due to technical error"]
+}
+
+# Identical parsed files re-run the same prompts, so node results are reused for a day
+NODE_CACHE_TTL_SECONDS = 86400
+
+def _node_cache_key(state: "GraphState") -> str:
+    """Hash the node inputs; precomputed keys are included since they change what a node does"""
+    content = "\x00".join([state["raw_text"], state["description"], *sorted(state["insights"])])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+def _is_fallback_write(writes) -> bool:
+    """A node that fell back to a placeholder also writes its name to the 'failed' channel"""
+    return any(channel == "failed" for channel, _ in writes)
+
+class _SuccessOnlyCache(InMemoryCache):
+    """Node cache that skips writes from failed nodes, so the next analysis retries them"""
+
+    def set(self, pairs: Mapping) -> None:
+        super().set({key: entry for key, entry in pairs.items() if not _is_fallback_write(entry[0])})
+
+    async def aset(self, pairs: Mapping) -> None:
+        self.set(pairs)
+
+def _merge_insights(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducer so parallel nodes can each contribute their own insight key"""
+    return {**left, **right}
 
 class GraphState(TypedDict):
     raw_text: str
     description: str
-    insights: Dict[str, Any]
+    insights: Annotated[Dict[str, Any], _merge_insights]
+    failed: Annotated[List[str], operator.add]
 
 class LangGraphService:
     def __init__(self):
-        self.client = AsyncTogether(api_key=settings.together_api_key)
+        self.client = together_client
+        self.graph = self._build_graph()
+
+    def _build_graph(self):
+        """Compile the insight workflow once so requests only invoke it"""
+        workflow = StateGraph(GraphState)
+
+        # Add nodes
+        cache_policy = CachePolicy(key_func=_node_cache_key, ttl=NODE_CACHE_TTL_SECONDS)
+        workflow.add_node("analyze_trends", self._analyze_trends, cache_policy=cache_policy)
+        workflow.add_node("analyze_anomalies", self._analyze_anomalies, cache_policy=cache_policy)
+        workflow.add_node("generate_predictions", self._generate_predictions, cache_policy=cache_policy)
+
+        # Fan out: the nodes are independent, so run them as parallel branches
+        for node in ("analyze_trends", "analyze_anomalies", "generate_predictions"):
+            workflow.add_edge(START, node)
+            workflow.add_edge(node, END)
+
+        return workflow.compile(cache=_SuccessOnlyCache())
+
+    def _build_messages(self, system_prompt: str, state: GraphState) -> list:
+        """Static instructions first, then the per-request data slice"""
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": DATA_PROMPT.format(
+                raw_text=state['raw_text'],
+                description=state['description']
+            )}
+        ]
+
+    def _fallback(self, key: str) -> Dict[str, Any]:
+        """Placeholder for one insight key; the 'failed' write keeps it out of the node cache"""
+        return {"insights": {key: FALLBACK_INSIGHTS[key]}, "failed": [key]}
 
     def _truncate_text(self, text: str, max_chars: int = 2000) -> str:
         """Truncate text to avoid token limits"""
         if len(text) <= max_chars:
             return text
-        
-        # Try to truncate at a reasonable breakpoint
-        truncated = text[:max_chars]
-        
-        # Find the last complete line
-        last_newline = truncated.rfind('\n')
-        if last_newline > max_chars * 0.8:  # If we can keep 80% of content
-            truncated = truncated[:last_newline]
-        
-        return truncated + "\n... (truncated for analysis)"
-
-    async def generate_insights(self, raw_text: str, description: str) -> Dict[str, Any]:
+
+        # Cut at the last complete line if one ends in the trailing 20%, so we keep 80% of content
+        last_newline = text.rfind('\n', int(max_chars * 0.8), max_chars)
+        cut = last_newline if last_newline != -1 else max_chars
+
+        return text[:cut] + "\n... (truncated for analysis)"
+
+    def _computed_trends(self, computed_insights: Dict[str, Any]) -> Optional[List[str]]:
+        """Describe trends straight from the computed monthly figures when they are available"""
+        monthly_trends = computed_insights.get('monthly_trends') or []
+        growth = computed_insights.get('growth_metrics')
+        if len(monthly_trends) < 2 or not growth:
+            return None
+
+        rate = growth['monthly_growth_rate']
+        latest = monthly_trends[-1]
+        peak = max(monthly_trends, key=lambda month: month['revenue'])
+        if rate > 0:
+            change = f"grew {rate:.1f}%"
+        elif rate < 0:
+            change = f"declined {-rate:.1f}%"
+        else:
+            change = "was flat"
+        trends = [
+            f"Revenue {change} month-over-month in {latest['month']}",
+            f"Peak month was {peak['month']} with ${peak['revenue']:,.2f} in revenue"
+        ]
+
+        categories = computed_insights.get('revenue_by_category') or []
+        total_revenue = sum(cat['revenue'] for cat in categories)
+        if categories and total_revenue > 0:
+            top = categories[0]
+            trends.append(f"{top['category']} leads revenue with {top['revenue'] / total_revenue * 100:.1f}% of the total")
+
+        return trends
+
+    def _computed_anomalies(self, computed_insights: Dict[str, Any]) -> Optional[List[str]]:
+        """Flag transaction outliers with the IQR rule from the computed revenue distribution"""
+        dist = computed_insights.get('revenue_distribution')
+        if not dist:
+            return None
+
+        iqr = dist['q3'] - dist['q1']
+        upper_fence = dist['q3'] + 1.5 * iqr
+        lower_fence = dist['q1'] - 1.5 * iqr
+        anomalies = []
+        if dist['max'] > upper_fence:
+            anomalies.append(f"Largest transaction (${dist['max']:,.2f}) is far above the typical range (upper fence ${upper_fence:,.2f})")
+        if dist['min'] < lower_fence:
+            anomalies.append(f"Smallest transaction (${dist['min']:,.2f}) is far below the typical range (lower fence ${lower_fence:,.2f})")
+
+        return anomalies or ["No significant statistical outliers in transaction values"]
+
+    async def _analyze_trends(self, state: GraphState) -> Dict[str, Any]:
+        if "trends" in state["insights"]:
+            # Already derived from computed data
+            return {"insights": {}}
         try:
+            async with llm_semaphore:
+                response = await self.client.chat.completions.create(
+                    model="mistralai/Mixtral-8x7B-Instruct-v0.1",
+                    messages=self._build_messages(TRENDS_SYSTEM_PROMPT, state),
+                    response_format={"type": "json_object"},
+                    max_tokens=300,
+                    temperature=0.3
+                )
+
+            content = response.choices[0].message.content.strip()
+            logger.info("Raw trends response", content=content[:200])
+
+            try:
+                trends_data = json.loads(content)
+            except json.JSONDecodeError as e:
+                logger.warning("Failed to parse trends JSON", error=str(e), content=content[:100])
+                return self._fallback("trends")
+            trends = trends_data.get("trends", ["Unable to identify specific trends"])
+
+            logger.info("Generated trends", trends_count=len(trends))
+            return {"insights": {"trends": trends}}
+
+        except Exception as e:
+            logger.error("Error in analyze_trends", error=str(e), error_type=type(e).__name__)
+            return self._fallback("trends")
+
+    async def _analyze_anomalies(self, state: GraphState) -> Dict[str, Any]:
+        if "anomalies" in state["insights"]:
+            # Already derived from computed data
+            return {"insights": {}}
+        try:
+            async with llm_semaphore:
+                response = await self.client.chat.completions.create(
+                    model="mistralai/Mixtral-8x7B-Instruct-v0.1",
+                    messages=self._build_messages(ANOMALIES_SYSTEM_PROMPT, state),
+                    response_format={"type": "json_object"},
+                    max_tokens=300,
+                    temperature=0.3
+                )
+
+            content = response.choices[0].message.content.strip()
+            logger.info("Raw anomalies response", content=content[:200])
+
+            try:
+                anomalies_data = json.loads(content)
+            except json.JSONDecodeError as e:
+                logger.warning("Failed to parse anomalies JSON", error=str(e), content=content[:100])
+                return self._fallback("anomalies")
+            anomalies = anomalies_data.get("anomalies", ["No significant anomalies detected"])
+
+            logger.info("Generated anomalies", anomalies_count=len(anomalies))
+            return {"insights": {"anomalies": anomalies}}
+
+        except Exception as e:
+            logger.error("Error in analyze_anomalies", error=str(e), error_type=type(e).__name__)
+            return self._fallback("anomalies")
+
+    async def _generate_predictions(self, state: GraphState) -> Dict[str, Any]:
+        try:
+            async with llm_semaphore:
+                response = await self.client.chat.completions.create(
+                    model="mistralai/Mixtral-8x7B-Instruct-v0.1",
+                    messages=self._build_messages(PREDICTIONS_SYSTEM_PROMPT, state),
+                    response_format={"type": "json_object"},
+                    max_tokens=300,
+                    temperature=0.3
+                )
+
+            content = response.choices[0].message.content.strip()
+            logger.info("Raw predictions response", content=content[:200])
+
+            try:
+                predictions_data = json.loads(content)
+            except json.JSONDecodeError as e:
+                logger.warning("Failed to parse predictions JSON", error=str(e), content=content[:100])
+                return self._fallback("predictions")
+            predictions = predictions_data.get("predictions", ["Unable to generate specific predictions"])
+
+            logger.info("Generated predictions", predictions_count=len(predictions))
+            return {"insights": {"predictions": predictions}}
+
+        except Exception as e:
+            logger.error("Error in generate_predictions", error=str(e), error_type=type(e).__name__)
+            return self._fallback("predictions")
+
+    async def generate_insights(self, raw_text: str, description: str, computed_insights: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Fill what the computed data already answers; only the rest goes to the LLM
+        precomputed = {}
+        try:
+            if computed_insights:
+                trends = self._computed_trends(computed_insights)
+                if trends is not None:
+                    precomputed["trends"] = trends
+                anomalies = self._computed_anomalies(computed_insights)
+                if anomalies is not None:
+                    precomputed["anomalies"] = anomalies
+
             # Truncate raw_text to prevent token limit issues
             truncated_text = self._truncate_text(raw_text, 1500)
             truncated_description = self._truncate_text(description, 500)
-            
-            logger.info("Starting insight generation", 
-                       raw_text_length=len(raw_text), 
-                       truncated_length=len(truncated_text))
-
-            # Define the LangGraph workflow
-            workflow = StateGraph(GraphState)
-
-            # Nodes with better error handling
-            async def analyze_trends(state: GraphState) -> GraphState:
-                try:
-                    prompt = f"""
-                    Analyze the following spreadsheet data to identify 2-3 key business trends.
-                    
-                    Data Sample:
-                    {state['raw_text'][:800]}
-                    
-                    Description:
-                    {state['description']}
-                    
-                    Return a JSON object with a 'trends' key containing a list of trend descriptions.
-                    Example: {{"trends": ["Sales increased by 15% month-over-month", "Technology products show highest growth"]}}
-                    """
-                    
-                    response = await self.client.chat.completions.create(
-                        model="mistralai/Mixtral-8x7B-Instruct-v0.1",
-                        messages=[{"role": "user", "content": prompt}],
-                        response_format={"type": "json_object"},
-                        max_tokens=300,
-                        temperature=0.3
-                    )
-                    
-                    content = response.choices[0].message.content.strip()
-                    logger.info("Raw trends response", content=content[:200])
-                    
-                    try:
-                        trends_data = json.loads(content)
-                        trends = trends_data.get("trends", ["Unable to identify specific trends"])
-                    except json.JSONDecodeError as e:
-                        logger.warning("Failed to parse trends JSON", error=str(e), content=content[:100])
-                        trends = ["Error parsing trends analysis"]
-                    
-                    state["insights"]["trends"] = trends
-                    logger.info("Generated trends", trends_count=len(trends))
-                    return state
-                    
-                except Exception as e:
-                    logger.error("Error in analyze_trends", error=str(e), error_type=type(e).__name__)
-                    state["insights"]["trends"] = ["Error analyzing trends"]
-                    return state
-
-            async def analyze_anomalies(state: GraphState) -> GraphState:
-                try:
-                    prompt = f"""
-                    Analyze the following data to identify 1-2 anomalies or unusual patterns.
-                    
-                    Data Sample:
-                    {state['raw_text'][:800]}
-                    
-                    Description:
-                    {state['description']}
-                    
-                    Return a JSON object with an 'anomalies' key containing a list of anomaly descriptions.
-                    Example: {{"anomalies": ["Unusually high returns in March", "Spike in weekend sales"]}}
-                    """
-                    
-                    response = await self.client.chat.completions.create(
-                        model="mistralai/Mixtral-8x7B-Instruct-v0.1",
-                        messages=[{"role": "user", "content": prompt}],
-                        response_format={"type": "json_object"},
-                        max_tokens=300,
-                        temperature=0.3
-                    )
-                    
-                    content = response.choices[0].message.content.strip()
-                    logger.info("Raw anomalies response", content=content[:200])
-                    
-                    try:
-                        anomalies_data = json.loads(content)
-                        anomalies = anomalies_data.get("anomalies", ["No significant anomalies detected"])
-                    except json.JSONDecodeError as e:
-                        logger.warning("Failed to parse anomalies JSON", error=str(e), content=content[:100])
-                        anomalies = ["Error parsing anomalies analysis"]
-                    
-                    state["insights"]["anomalies"] = anomalies
-                    logger.info("Generated anomalies", anomalies_count=len(anomalies))
-                    return state
-                    
-                except Exception as e:
-                    logger.error("Error in analyze_anomalies", error=str(e), error_type=type(e).__name__)
-                    state["insights"]["anomalies"] = ["Error analyzing anomalies"]
-                    return state
-
-            async def generate_predictions(state: GraphState) -> GraphState:
-                try:
-                    prompt = f"""
-                    Based on the following data, generate 1-2 business predictions or recommendations.
-                    
-                    Data Sample:
-                    {state['raw_text'][:800]}
-                    
-                    Description:
-                    {state['description']}
-                    
-                    Return a JSON object with a 'predictions' key containing a list of predictions.
-                    Example: {{"predictions": ["Expect 10% growth next quarter", "Consider expanding top-performing regions"]}}
-                    """
-                    
-                    response = await self.client.chat.completions.create(
-                        model="mistralai/Mixtral-8x7B-Instruct-v0.1",
-                        messages=[{"role": "user", "content": prompt}],
-                        response_format={"type": "json_object"},
-                        max_tokens=300,
-                        temperature=0.3
-                    )
-                    
-                    content = response.choices[0].message.content.strip()
-                    logger.info("Raw predictions response", content=content[:200])
-                    
-                    try:
-                        predictions_data = json.loads(content)
-                        predictions = predictions_data.get("predictions", ["Unable to generate specific predictions"])
-                    except json.JSONDecodeError as e:
-                        logger.warning("Failed to parse predictions JSON", error=str(e), content=content[:100])
-                        predictions = ["Error parsing predictions analysis"]
-                    
-                    state["insights"]["predictions"] = predictions
-                    logger.info("Generated predictions", predictions_count=len(predictions))
-                    return state
-                    
-                except Exception as e:
-                    logger.error("Error in generate_predictions", error=str(e), error_type=type(e).__name__)
-                    state["insights"]["predictions"] = ["Error generating predictions"]
-                    return state
-
-            # Add nodes
-            workflow.add_node("analyze_trends", analyze_trends)
-            workflow.add_node("analyze_anomalies", analyze_anomalies)  
-            workflow.add_node("generate_predictions", generate_predictions)
-
-            # Define edges
-            workflow.set_entry_point("analyze_trends")
-            workflow.add_edge("analyze_trends", "analyze_anomalies")
-            workflow.add_edge("analyze_anomalies", "generate_predictions")
-            workflow.add_edge("generate_predictions", END)
-
-            # Compile and run
-            graph = workflow.compile()
+
+            logger.info("Starting insight generation",
+                       raw_text_length=len(raw_text),
+                       truncated_length=len(truncated_text),
+                       precomputed_keys=list(precomputed))
+
             initial_state = GraphState(
-                raw_text=truncated_text, 
-                description=truncated_description, 
-                insights={}
+                raw_text=truncated_text,
+                description=truncated_description,
+                insights=precomputed,
+                failed=[]
             )
-            result = await graph.ainvoke(initial_state)
+            result = await self.graph.ainvoke(initial_state)
 
-            logger.info("AI insights generated successfully")
+            if result["failed"]:
+                logger.warning("Some insights fell back to placeholders", failed=result["failed"])
+            else:
+                logger.info("AI insights generated successfully")
             return result["insights"]
-            
+
         except Exception as e:
-            logger.error("Failed to generate insights", 
-                        error=str(e), 
+            logger.error("Failed to generate insights",
+                        error=str(e),
                         error_type=type(e).__name__)
-            
+
             # Return fallback insights instead of raising exception
-            return {
-                "trends": ["Unable to analyze trends due to technical error"],
-                "anomalies": ["Unable to analyze anomalies due to technical error"], 
-                "predictions": ["Unable to generate predictions due to technical error"]
-            }
\ No newline at end of file
+            return {**FALLBACK_INSIGHTS, **precomputed}
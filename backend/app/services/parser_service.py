@@ -1,17 +1,128 @@
 import pandas as pd
-import io
+import numpy as np
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from numba import njit, prange
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.compute as pc
+import os
+import tempfile
+import asyncio
 import aiohttp
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from collections import OrderedDict
+from itertools import starmap
+import hashlib
+import threading
 from fastapi import HTTPException
 from app.utils.logger import logger
 from app.services.data_analysis_service import DataAnalysisService
 
+# Arrow splits CSV input into blocks parsed on separate threads
+CSV_BLOCK_SIZE = 8 << 20
+
+DOWNLOAD_CHUNK_SIZE = 1 << 20
+
+# The markdown sample only feeds a truncated LLM prompt, so more rows are wasted formatting
+RAW_TEXT_MAX_ROWS = 200
+
+# Parsing is CPU-bound; pandas and Arrow release the GIL in their kernels, so one worker per core
+PARSE_EXECUTOR = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="parser")
+
+# Connection pool for file downloads from storage
+DOWNLOAD_CONNECTIONS_PER_HOST = 16
+DNS_CACHE_TTL_SECONDS = 300
+
+# One line per numeric column, filled from (name, min, max, mean)
+NUMERIC_SUMMARY_TEMPLATE = "- {0}: min={1:.2f}, max={2:.2f}, mean={3:.2f}\n"
+
+# Above this many numeric cells the description stats switch to the parallel Numba kernel
+NUMBA_MIN_CELLS = 1_000_000
+
+# Numba's default workqueue threading layer aborts the process on concurrent entry,
+# and parses run on several PARSE_EXECUTOR threads at once
+_NUMBA_KERNEL_LOCK = threading.Lock()
+
+# Re-analysis of an unchanged file reuses the previous parse
+PARSE_CACHE_MAX_ENTRIES = 64
+
+def _as_float(scalar: pa.Scalar) -> float:
+    """Unwrap an Arrow scalar, treating null (an all-missing column) as NaN like pandas does"""
+    value = scalar.as_py()
+    return float("nan") if value is None else float(value)
+
+@njit(parallel=True, nogil=True, cache=True)
+def _column_min_max_mean(values: np.ndarray) -> np.ndarray:
+    """Min, max and mean of each column in one pass, skipping NaN; columns are spread across threads"""
+    n_rows, n_cols = values.shape
+    out = np.empty((n_cols, 3))
+    for j in prange(n_cols):
+        lo = np.inf
+        hi = -np.inf
+        total = 0.0
+        count = 0
+        for i in range(n_rows):
+            v = values[i, j]
+            if not np.isnan(v):
+                if v < lo:
+                    lo = v
+                if v > hi:
+                    hi = v
+                total += v
+                count += 1
+        if count == 0:
+            out[j, 0] = np.nan
+            out[j, 1] = np.nan
+            out[j, 2] = np.nan
+        else:
+            out[j, 0] = lo
+            out[j, 1] = hi
+            out[j, 2] = total / count
+    return out
+
+# Leading bytes of the binary spreadsheet containers; anything else is treated as CSV text
+XLSX_MAGIC = b"PK\x03\x04"  # Office Open XML is a zip archive
+XLS_MAGIC = b"\xd0\xcf\x11\xe0"  # Legacy BIFF lives in an OLE2 compound file
+
+def _sniff_file_type(head: bytes) -> str:
+    if head.startswith(XLSX_MAGIC):
+        return "xlsx"
+    if head.startswith(XLS_MAGIC):
+        return "xls"
+    return "csv"
+
 class ParserService:
     def __init__(self):
         self.data_analysis_service = DataAnalysisService()
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_lock = asyncio.Lock()
+        self._parse_cache: OrderedDict = OrderedDict()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Create the download session on first use so keep-alive connections are reused across parses"""
+        if self._session is None or self._session.closed:
+            async with self._session_lock:
+                if self._session is None or self._session.closed:
+                    connector = aiohttp.TCPConnector(
+                        limit_per_host=DOWNLOAD_CONNECTIONS_PER_HOST,
+                        ttl_dns_cache=DNS_CACHE_TTL_SECONDS
+                    )
+                    self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
 
-    async def parse_spreadsheet(self, file_url: str, file_type: str) -> tuple[str, str, dict]:
+    async def parse_spreadsheet(self, file_url: str, file_type: str, *, include_raw: bool = True) -> tuple[str, str, dict]:
+        """Download and parse a spreadsheet; pass include_raw=False to skip rendering the markdown sample"""
+        tmp_path = None
         try:
-            async with aiohttp.ClientSession() as session:
+            # Stream the download to disk so the body is never held in memory; the parsers read it from there
+            with tempfile.NamedTemporaryFile(suffix=f".{file_type}", delete=False) as tmp:
+                tmp_path = tmp.name
+                session = await self._get_session()
                 async with session.get(file_url) as response:
                     if response.status != 200:
                         error_detail = await response.text()
@@ -19,49 +130,150 @@ class ParserService:
                             status_code=400,
                             detail=f"Failed to download file: {response.reason} - {error_detail}"
                         )
-                    file_content = await response.read()
+                    content_hash = hashlib.sha256()
+                    head = b""
+                    async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                        tmp.write(chunk)
+                        content_hash.update(chunk)
+                        if len(head) < 8:
+                            head += chunk[:8 - len(head)]
 
-            # Read file into pandas DataFrame
-            if file_type == "csv":
-                df = pd.read_csv(io.BytesIO(file_content))
-            elif file_type in ["xls", "xlsx"]:
-                df = pd.read_excel(io.BytesIO(file_content), engine="openpyxl")
-            else:
-                raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_type}")
+            # Dispatch on the content, not the extension, so a mislabelled file doesn't fail deep inside a parser
+            detected_type = _sniff_file_type(head)
+            if detected_type != file_type:
+                logger.warning("File content does not match its type", file_type=file_type, detected_type=detected_type, file_url=file_url)
+                file_type = detected_type
 
-            # Generate raw text (markdown)
-            raw_text = df.to_markdown(index=False)
+            cache_key = (content_hash.digest(), file_type, include_raw)
+            cached = self._parse_cache.get(cache_key)
+            if cached is not None:
+                self._parse_cache.move_to_end(cache_key)
+                logger.info("Spreadsheet parse served from cache", file_url=file_url)
+                return cached
 
-            # Generate natural language description
-            description = self._generate_description(df)
-            
-            # Compute actual business insights
-            computed_insights = self.data_analysis_service.compute_business_insights(df)
+            # Parse off the event loop so other requests keep being served
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                PARSE_EXECUTOR, self._parse_sync, tmp_path, file_type, include_raw
+            )
+
+            self._parse_cache[cache_key] = result
+            while len(self._parse_cache) > PARSE_CACHE_MAX_ENTRIES:
+                self._parse_cache.popitem(last=False)
 
             logger.info("Spreadsheet parsed successfully", file_url=file_url)
-            return raw_text, description, computed_insights
+            return result
+        except HTTPException as e:
+            raise e
+        except ValueError as e:
+            # Malformed content (pa.ArrowInvalid and pandas parser errors are ValueErrors) is the client's problem
+            logger.warning("Invalid spreadsheet content", error=str(e), file_url=file_url)
+            raise HTTPException(status_code=400, detail=f"Invalid file: {str(e)}")
         except Exception as e:
-            logger.error("Failed to parse spreadsheet", error=str(e), file_url=file_url)
+            logger.exception("Failed to parse spreadsheet", error=str(e), file_url=file_url)
             raise HTTPException(status_code=500, detail=f"Parsing error: {str(e)}")
+        finally:
+            if tmp_path:
+                os.remove(tmp_path)
+
+    def _parse_sync(self, path: str, file_type: str, include_raw: bool) -> tuple[str, str, dict]:
+        """Parse the downloaded file and derive the text sample, description and insights"""
+        # Read file into pandas DataFrame
+        if file_type == "csv":
+            df = self._read_csv(path)
+        elif file_type in ["xls", "xlsx"]:
+            df = self._read_excel(path)
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported file type: {file_type}")
+
+        df = self._downcast_integers(df)
+
+        # Generate raw text (markdown) from a leading sample of rows
+        raw_text = ""
+        if include_raw:
+            raw_text = df.head(RAW_TEXT_MAX_ROWS).to_markdown(index=False)
+            if len(df) > RAW_TEXT_MAX_ROWS:
+                raw_text += f"\n\n...and {len(df) - RAW_TEXT_MAX_ROWS} more rows"
+
+        # Generate natural language description
+        description = self._generate_description(df)
+        
+        # Compute actual business insights
+        computed_insights = self.data_analysis_service.compute_business_insights(df)
+
+        return raw_text, description, computed_insights
+
+    def _read_csv(self, path: str) -> pd.DataFrame:
+        """Parse CSV with Arrow's multithreaded reader, falling back to pandas for files it rejects"""
+        try:
+            # Memory-map the file so Arrow reads the page cache directly instead of copying it
+            with pa.memory_map(path) as source:
+                table = pacsv.read_csv(
+                    source,
+                    read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE, use_threads=True),
+                    # Match pandas, which reads empty cells as missing
+                    convert_options=pacsv.ConvertOptions(strings_can_be_null=True)
+                )
+            # Release each Arrow column as it is converted so the table and frame never coexist in full
+            df = table.to_pandas(split_blocks=True, self_destruct=True)
+            del table
+            return df
+        except pa.ArrowInvalid as e:
+            logger.warning("Arrow CSV parse failed, falling back to pandas", error=str(e))
+            return pd.read_csv(path)
+
+    def _read_excel(self, path: str) -> pd.DataFrame:
+        """Parse xls/xlsx with the Rust calamine engine, falling back to openpyxl when it is not installed"""
+        try:
+            return pd.read_excel(path, engine="calamine")
+        except ImportError:
+            logger.warning("python-calamine not installed, falling back to openpyxl")
+            return pd.read_excel(path, engine="openpyxl")
+
+    def _downcast_integers(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Shrink integer columns to the smallest dtype that holds their range so later passes move fewer bytes"""
+        int_cols = df.select_dtypes(include='integer').columns
+        if len(int_cols):
+            df[int_cols] = df[int_cols].apply(pd.to_numeric, downcast='integer')
+        return df
+
+    def _numeric_stats(self, df: pd.DataFrame, numeric_cols: list) -> list:
+        """(name, min, max, mean) for each numeric column"""
+        if len(df) * len(numeric_cols) > NUMBA_MIN_CELLS:
+            # Tall sheets: one fused pass per column, threaded across columns
+            values = df[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+            with _NUMBA_KERNEL_LOCK:
+                stats = _column_min_max_mean(values)
+            return [(name, *row) for name, row in zip(numeric_cols, stats.tolist())]
+
+        # Arrow kernels: min_max finds both extrema in one pass over each column
+        table = pa.Table.from_pandas(df[numeric_cols], preserve_index=False)
+        stats = []
+        for name, column in zip(table.column_names, table.columns):
+            extrema = pc.min_max(column)
+            stats.append((name, _as_float(extrema['min']), _as_float(extrema['max']), _as_float(pc.mean(column))))
+        return stats
 
     def _generate_description(self, df: pd.DataFrame) -> str:
         try:
-            columns = df.columns.tolist()
-            dtypes = df.dtypes.to_dict()
-            row_count = len(df)
-            description = f"The spreadsheet contains {row_count} rows and {len(columns)} columns. "
-            description += "Columns and their data types:\n"
-            for col, dtype in dtypes.items():
-                description += f"- {col}: {dtype}\n"
+            n_rows, n_cols = df.shape
+            parts = [
+                f"The spreadsheet contains {n_rows} rows and {n_cols} columns. ",
+                "Columns and their data types:\n"
+            ]
+            # One walk over the dtypes lists the columns and picks out the numeric ones
+            numeric_cols = []
+            for col, dtype in zip(df.columns, df.dtypes):
+                parts.append(f"- {col}: {dtype}\n")
+                if is_numeric_dtype(dtype) and not is_bool_dtype(dtype):
+                    numeric_cols.append(col)
             
             # Basic summary for numeric columns
-            numeric_cols = df.select_dtypes(include=['int64', 'float64']).columns
-            if numeric_cols.any():
-                description += "\nSummary of numeric columns:\n"
-                for col in numeric_cols:
-                    description += f"- {col}: min={df[col].min():.2f}, max={df[col].max():.2f}, mean={df[col].mean():.2f}\n"
+            if numeric_cols:
+                parts.append("\nSummary of numeric columns:\n")
+                parts.extend(starmap(NUMERIC_SUMMARY_TEMPLATE.format, self._numeric_stats(df, numeric_cols)))
             
-            return description
+            return "".join(parts)
         except Exception as e:
             logger.error("Failed to generate description", error=str(e))
             return "Unable to generate description due to an error."
\ No newline at end of file
@@ -1,50 +1,122 @@
-import os
-from typing import Dict, Any, Optional
+import asyncio
+import copy
+from typing import Dict, Any, Iterable, List
+from types import MappingProxyType
+from operator import itemgetter
 from datetime import datetime
-from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.colors import HexColor, Color
 from reportlab.lib.units import inch
 from reportlab.platypus import (
-    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
-    PageBreak, Image, KeepTogether
+    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 )
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.graphics.shapes import Drawing, Rect
-from reportlab.graphics.charts.linecharts import HorizontalLineChart
-from reportlab.graphics.charts.barcharts import VerticalBarChart
-from reportlab.graphics.charts.piecharts import Pie
-from reportlab.graphics import renderPDF
-import matplotlib.pyplot as plt
-import matplotlib.patches as mpatches
-import seaborn as sns
+from reportlab.lib.enums import TA_CENTER
 from io import BytesIO
-import tempfile
+import numpy as np
 from app.utils.logger import logger
 
+# Report color scheme, parsed once at import
+COLORS = MappingProxyType({
+    'primary': HexColor('#2563EB'),      # Blue
+    'secondary': HexColor('#10B981'),    # Green
+    'accent': HexColor('#F59E0B'),       # Orange
+    'danger': HexColor('#EF4444'),       # Red
+    'dark': HexColor('#1F2937'),         # Dark Gray
+    'light': HexColor('#F3F4F6'),        # Light Gray
+    'white': HexColor('#FFFFFF')
+})
+
+# Fixed text that appears in every report; parsed into Paragraphs once
+STATIC_PARAGRAPHS = {
+    'title': ("📊 Data Analysis Report", 'CustomTitle'),
+    'exec_summary': ("Executive Summary", 'SectionHeader'),
+    'dataset_overview': ("Dataset Overview", 'SectionHeader'),
+    'sales_header': ("Sales Performance Analysis", 'SectionHeader'),
+    'top_sales_reps': ("🏆 Top Sales Representatives", 'Normal'),
+    'product_header': ("Product Performance Analysis", 'SectionHeader'),
+    'best_products': ("🎯 Best Selling Products", 'Normal'),
+    'revenue_by_category': ("📊 Revenue by Category", 'Normal'),
+    'customer_header': ("Customer Analysis", 'SectionHeader'),
+    'top_customers': ("💎 Top Valued Customers", 'Normal'),
+    'customer_insights': ("📈 Customer Insights", 'Normal'),
+    'customer_metrics_heading': ("<b>Key Customer Metrics:</b>", 'Normal'),
+    'time_header': ("Time-Based Analysis", 'SectionHeader'),
+    'monthly_trends': ("📅 Monthly Performance Trends", 'Normal'),
+    'growth_heading': ("<b>Growth Analysis:</b>", 'Normal'),
+    'regional_header': ("Regional Performance", 'SectionHeader'),
+    'performance_by_region': ("🌍 Performance by Region", 'Normal'),
+    'revenue_distribution_header': ("Revenue Distribution Analysis", 'SectionHeader'),
+    'footer': ("""
+        <b>Report generated by AI Data Analyst</b><br/>
+        This automated analysis provides insights based on your data patterns and trends.<br/>
+        For questions or additional analysis, please contact support.
+        """, 'SmallText'),
+}
+
+# Month names for the report date, so only the time goes through strftime
+_MONTHS = (
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+)
+
+# Page setup shared by every report; only the output buffer differs per call
+DOC_TEMPLATE_KWARGS = MappingProxyType({
+    'pagesize': A4,
+    'rightMargin': 72,
+    'leftMargin': 72,
+    'topMargin': 72,
+    'bottomMargin': 18
+})
+
+# Rows per Table; Platypus layout cost grows faster than linearly with table length
+TABLE_CHUNK_ROWS = 50
+
+# Row fields for insight lists whose entries always carry every key
+MONTH_FIELDS = itemgetter('month', 'revenue', 'transactions')
+REGION_FIELDS = itemgetter('region', 'total_revenue', 'revenue_share_percent', 'transactions', 'avg_transaction')
+
+# Money cells render as $1,234.56
+CURRENCY_FORMAT = "${:,.2f}"
+
+def _format_currency_column(values: Iterable[float]) -> List[str]:
+    """Format a column of amounts; map() drives the bound str.format from C instead of a per-row f-string"""
+    return list(map(CURRENCY_FORMAT.format, values))
+
 class PDFExportService:
+    # Shared by all instances and reports; built on first construction
+    _styles = None
+    _static_paragraphs = None
+    _table_styles = None
+
     def __init__(self):
-        # Define color scheme
-        self.colors = {
-            'primary': HexColor('#2563EB'),      # Blue
-            'secondary': HexColor('#10B981'),    # Green
-            'accent': HexColor('#F59E0B'),       # Orange
-            'danger': HexColor('#EF4444'),       # Red
-            'dark': HexColor('#1F2937'),         # Dark Gray
-            'light': HexColor('#F3F4F6'),        # Light Gray
-            'white': HexColor('#FFFFFF')
-        }
+        self.colors = COLORS
         
         # Setup styles
-        self.styles = getSampleStyleSheet()
-        self._create_custom_styles()
+        if PDFExportService._styles is None:
+            PDFExportService._styles = self._create_custom_styles()
+            PDFExportService._static_paragraphs = {
+                key: Paragraph(text, PDFExportService._styles[style])
+                for key, (text, style) in STATIC_PARAGRAPHS.items()
+            }
+        self.styles = PDFExportService._styles
+
+        # Table styles never vary per report, so every table shares these
+        if PDFExportService._table_styles is None:
+            PDFExportService._table_styles = self._create_table_styles()
     
+    def _static(self, key: str) -> Paragraph:
+        """Fresh copy of a prebuilt Paragraph; it shares the parsed text but gets its own layout state"""
+        return copy.copy(self._static_paragraphs[key])
+
     def _create_custom_styles(self):
         """Create custom paragraph styles"""
+        styles = getSampleStyleSheet()
+
         # Title style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomTitle',
-            parent=self.styles['Heading1'],
+            parent=styles['Heading1'],
             fontSize=24,
             textColor=self.colors['primary'],
             spaceAfter=20,
@@ -53,9 +125,9 @@ class PDFExportService:
         ))
         
         # Subtitle style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='CustomSubtitle',
-            parent=self.styles['Heading2'],
+            parent=styles['Heading2'],
             fontSize=16,
             textColor=self.colors['dark'],
             spaceAfter=15,
@@ -64,9 +136,9 @@ class PDFExportService:
         ))
         
         # Section header style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='SectionHeader',
-            parent=self.styles['Heading3'],
+            parent=styles['Heading3'],
             fontSize=14,
             textColor=self.colors['primary'],
             spaceAfter=10,
@@ -79,9 +151,9 @@ class PDFExportService:
         ))
         
         # Metric style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='MetricValue',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=18,
             textColor=self.colors['secondary'],
             alignment=TA_CENTER,
@@ -89,14 +161,83 @@ class PDFExportService:
         ))
         
         # Small text style
-        self.styles.add(ParagraphStyle(
+        styles.add(ParagraphStyle(
             name='SmallText',
-            parent=self.styles['Normal'],
+            parent=styles['Normal'],
             fontSize=10,
             textColor=self.colors['dark'],
             spaceAfter=5
         ))
 
+        return styles
+
+    def _build_table_style(self, header_color: Color) -> TableStyle:
+        """Ranked data table: colored header row, light body, grid in the header color"""
+        return TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), header_color),
+            ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
+            ('ALTERNATE', (0, 1), (-1, -1), self.colors['white']),
+            ('GRID', (0, 0), (-1, -1), 1, header_color),
+            ('FONTSIZE', (0, 1), (-1, -1), 9)
+        ])
+
+    def _create_table_styles(self) -> Dict[str, TableStyle]:
+        """Create the table styles used across report sections"""
+        return {
+            'primary': self._build_table_style(self.colors['primary']),
+            'secondary': self._build_table_style(self.colors['secondary']),
+            'accent': self._build_table_style(self.colors['accent']),
+            'overview': TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), self.colors['primary']),
+                ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
+                ('GRID', (0, 0), (-1, -1), 1, self.colors['primary'])
+            ]),
+            'metrics': TableStyle([
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('BACKGROUND', (0, 0), (-1, -1), self.colors['light']),
+                ('BOX', (0, 0), (-1, -1), 1, self.colors['primary']),
+                ('INNERGRID', (0, 0), (-1, -1), 1, self.colors['primary']),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 0), (-1, -1), 10),
+                ('TOPPADDING', (0, 0), (-1, -1), 15),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
+            ]),
+        }
+
+    def _bullets(self, lines: List[str]) -> list:
+        """One Paragraph per bullet line"""
+        style = self.styles['Normal']
+        return [Paragraph(f"• {line}", style) for line in lines]
+
+    def _chunked_table(self, table_data: list, col_widths: list, style: TableStyle) -> list:
+        """Lay out a table as consecutive Tables of at most TABLE_CHUNK_ROWS rows, each repeating the header"""
+        header, rows = table_data[0], table_data[1:]
+        flowables = []
+        for start in range(0, max(len(rows), 1), TABLE_CHUNK_ROWS):
+            if flowables:
+                flowables.append(Spacer(1, 4))
+            table = Table([header] + rows[start:start + TABLE_CHUNK_ROWS], colWidths=col_widths)
+            table.setStyle(style)
+            flowables.append(table)
+        return flowables
+
+    def _add_section_on_new_page(self, story: list, section: list):
+        """Start a table-heavy section on a fresh page so Platypus doesn't retry fitting it across a page break"""
+        if section:
+            story.append(PageBreak())
+        story.extend(section)
+
     async def generate_insights_pdf(
         self, 
         insights: Dict[str, Any], 
@@ -105,69 +246,8 @@ class PDFExportService:
     ) -> bytes:
         """Generate a comprehensive PDF report from insights data"""
         try:
-            # Create a temporary file for the PDF
-            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp_file:
-                pdf_path = tmp_file.name
-            
-            # Create PDF document
-            doc = SimpleDocTemplate(
-                pdf_path,
-                pagesize=A4,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=18
-            )
-            
-            # Build the story (content)
-            story = []
-            
-            # Add header
-            story.extend(self._create_header(file_name))
-            
-            # Add executive summary
-            story.extend(self._create_executive_summary(insights))
-            
-            # Add dataset overview
-            if 'dataset_info' in insights:
-                story.extend(self._create_dataset_overview(insights['dataset_info']))
-            
-            # Add sales analysis
-            if 'top_sales_reps' in insights or 'sales_metrics' in insights:
-                story.extend(self._create_sales_section(insights))
-            
-            # Add product analysis
-            if 'top_products' in insights or 'revenue_by_category' in insights:
-                story.extend(self._create_product_section(insights))
-            
-            # Add customer analysis
-            if 'top_customers' in insights or 'customer_metrics' in insights:
-                story.extend(self._create_customer_section(insights))
-            
-            # Add time analysis
-            if 'monthly_trends' in insights or 'daily_patterns' in insights:
-                story.extend(self._create_time_analysis_section(insights))
-            
-            # Add regional analysis
-            if 'regional_performance' in insights:
-                story.extend(self._create_regional_section(insights))
-            
-            # Add revenue distribution
-            if 'revenue_distribution' in insights:
-                story.extend(self._create_revenue_distribution_section(insights))
-            
-            # Add footer
-            story.extend(self._create_footer())
-            
-            # Build PDF
-            doc.build(story)
-            
-            # Read the PDF content
-            with open(pdf_path, 'rb') as pdf_file:
-                pdf_content = pdf_file.read()
-            
-            # Clean up temporary file
-            os.unlink(pdf_path)
+            # Story assembly and layout are both CPU-bound; run them together off the event loop
+            pdf_content = await asyncio.to_thread(self._build_pdf, insights, file_name)
             
             logger.info("PDF report generated successfully", user_id=user_id, file_name=file_name)
             return pdf_content
@@ -176,15 +256,64 @@ class PDFExportService:
             logger.error("Failed to generate PDF report", error=str(e), user_id=user_id)
             raise
 
+    def _build_pdf(self, insights: Dict[str, Any], file_name: str) -> bytes:
+        """Assemble the report story and lay it out into PDF bytes"""
+        # Build the PDF in memory; ReportLab writes straight into the buffer
+        buffer = BytesIO()
+        
+        # Create PDF document
+        doc = SimpleDocTemplate(buffer, **DOC_TEMPLATE_KWARGS)
+        
+        # Build the story (content)
+        story = []
+        
+        # Add header
+        story.extend(self._create_header(file_name))
+        
+        # Add executive summary
+        story.extend(self._create_executive_summary(insights))
+        
+        # Add dataset overview
+        if 'dataset_info' in insights:
+            story.extend(self._create_dataset_overview(insights['dataset_info']))
+        
+        # Add sales analysis
+        if 'top_sales_reps' in insights or 'sales_metrics' in insights:
+            self._add_section_on_new_page(story, self._create_sales_section(insights))
+        
+        # Add product analysis
+        if 'top_products' in insights or 'revenue_by_category' in insights:
+            self._add_section_on_new_page(story, self._create_product_section(insights))
+        
+        # Add customer analysis
+        if 'top_customers' in insights or 'customer_metrics' in insights:
+            self._add_section_on_new_page(story, self._create_customer_section(insights))
+        
+        # Add time analysis
+        if 'monthly_trends' in insights or 'daily_patterns' in insights:
+            self._add_section_on_new_page(story, self._create_time_analysis_section(insights))
+        
+        # Add regional analysis
+        if 'regional_performance' in insights:
+            story.extend(self._create_regional_section(insights))
+        
+        # Add revenue distribution
+        if 'revenue_distribution' in insights:
+            story.extend(self._create_revenue_distribution_section(insights))
+        
+        # Add footer
+        story.extend(self._create_footer())
+        
+        # Build PDF
+        doc.build(story)
+        return buffer.getvalue()
+
     def _create_header(self, file_name: str) -> list:
         """Create PDF header section"""
         content = []
         
         # Title
-        content.append(Paragraph(
-            "📊 Data Analysis Report",
-            self.styles['CustomTitle']
-        ))
+        content.append(self._static('title'))
         
         # File name
         content.append(Paragraph(
@@ -193,8 +322,9 @@ class PDFExportService:
         ))
         
         # Generation date
+        now = datetime.now()
         content.append(Paragraph(
-            f"Generated on: {datetime.now().strftime('%B %d, %Y at %I:%M %p')}",
+            f"Generated on: {_MONTHS[now.month - 1]} {now.day:02d}, {now.year} at {now.strftime('%I:%M %p')}",
             self.styles['SmallText']
         ))
         
@@ -206,7 +336,7 @@ class PDFExportService:
         """Create executive summary section"""
         content = []
         
-        content.append(Paragraph("Executive Summary", self.styles['SectionHeader']))
+        content.append(self._static('exec_summary'))
         
         # Key metrics cards
         metrics = []
@@ -241,32 +371,23 @@ class PDFExportService:
         
         if metrics:
             # Create metrics table
-            table_data = []
-            for i in range(0, len(metrics), 3):
-                row = []
-                for j in range(3):
-                    if i + j < len(metrics):
-                        metric = metrics[i + j]
-                        cell_content = f"{metric[2]}<br/><b>{metric[1]}</b><br/>{metric[0]}"
-                        row.append(Paragraph(cell_content, self.styles['Normal']))
-                    else:
-                        row.append("")
-                table_data.append(row)
-            
-            if table_data:
-                metrics_table = Table(table_data, colWidths=[2.5*inch, 2.5*inch, 2.5*inch])
-                metrics_table.setStyle(TableStyle([
-                    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('BACKGROUND', (0, 0), (-1, -1), self.colors['light']),
-                    ('BOX', (0, 0), (-1, -1), 1, self.colors['primary']),
-                    ('INNERGRID', (0, 0), (-1, -1), 1, self.colors['primary']),
-                    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 0), (-1, -1), 10),
-                    ('TOPPADDING', (0, 0), (-1, -1), 15),
-                    ('BOTTOMPADDING', (0, 0), (-1, -1), 15),
-                ]))
-                content.append(metrics_table)
+            style = self.styles['Normal']
+            cells = [
+                Paragraph(f"{icon}<br/><b>{value}</b><br/>{label}", style)
+                for label, value, icon in metrics
+            ]
+            # At most four cards: one full-width row, or a 2x2 grid for four, so no empty padding cells
+            n = len(cells)
+            if n == 4:
+                table_data = [cells[:2], cells[2:]]
+                col_widths = [3.75*inch] * 2
+            else:
+                table_data = [cells]
+                col_widths = [7.5/n*inch] * n
+
+            metrics_table = Table(table_data, colWidths=col_widths)
+            metrics_table.setStyle(self._table_styles['metrics'])
+            content.append(metrics_table)
         
         content.append(Spacer(1, 20))
         return content
@@ -275,7 +396,7 @@ class PDFExportService:
         """Create dataset overview section"""
         content = []
         
-        content.append(Paragraph("Dataset Overview", self.styles['SectionHeader']))
+        content.append(self._static('dataset_overview'))
         
         # Dataset stats table
         data = [
@@ -287,16 +408,7 @@ class PDFExportService:
         ]
         
         table = Table(data, colWidths=[3*inch, 2*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), self.colors['primary']),
-            ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
-            ('GRID', (0, 0), (-1, -1), 1, self.colors['primary'])
-        ]))
+        table.setStyle(self._table_styles['overview'])
         
         content.append(table)
         content.append(Spacer(1, 15))
@@ -306,214 +418,198 @@ class PDFExportService:
     def _create_sales_section(self, insights: Dict[str, Any]) -> list:
         """Create sales analysis section"""
         content = []
+        added_body = False
         
-        content.append(Paragraph("Sales Performance Analysis", self.styles['SectionHeader']))
+        content.append(self._static('sales_header'))
         
         # Top performers
         if 'top_sales_reps' in insights and insights['top_sales_reps'].get('all_reps'):
-            content.append(Paragraph("🏆 Top Sales Representatives", self.styles['Normal']))
+            content.append(self._static('top_sales_reps'))
             
             # Create table for top sales reps
             headers = ['Rank', 'Sales Rep', 'Total Sales', 'Transactions', 'Avg Transaction']
-            table_data = [headers]
-            
-            for idx, rep in enumerate(insights['top_sales_reps']['all_reps'][:10], 1):
+            reps = insights['top_sales_reps']['all_reps'][:10]
+            # Sized up front; rows are assigned by index
+            table_data = [None] * (len(reps) + 1)
+            table_data[0] = headers
+            
+            # Fields may be missing; bind dict.get once instead of looking up the method per call
+            _get = dict.get
+            # Format each currency column in one call
+            total_sales = _format_currency_column(_get(rep, 'total_sales', 0) for rep in reps)
+            avg_transactions = _format_currency_column(_get(rep, 'avg_transaction', 0) for rep in reps)
+            
+            for idx, (rep, sales, avg_transaction) in enumerate(zip(reps, total_sales, avg_transactions), 1):
                 # Safely get values with defaults
-                rep_name = str(rep.get('name', 'Unknown Rep'))
-                total_sales = rep.get('total_sales', 0)
-                transactions = rep.get('transactions', 0)
-                avg_transaction = rep.get('avg_transaction', 0)
+                rep_name = str(_get(rep, 'name', 'Unknown Rep'))
+                transactions = _get(rep, 'transactions', 0)
                 
-                table_data.append([
-                    str(idx),
+                table_data[idx] = [
+                    f"{idx}",
                     rep_name,
-                    f"${total_sales:,.2f}",
-                    str(transactions),
-                    f"${avg_transaction:,.2f}"
-                ])
-            
-            sales_table = Table(table_data, colWidths=[0.6*inch, 2*inch, 1.5*inch, 1*inch, 1.4*inch])
-            sales_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), self.colors['primary']),
-                ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
-                ('ALTERNATE', (0, 1), (-1, -1), self.colors['white']),
-                ('GRID', (0, 0), (-1, -1), 1, self.colors['primary']),
-                ('FONTSIZE', (0, 1), (-1, -1), 9)
-            ]))
+                    sales,
+                    f"{transactions}",
+                    avg_transaction
+                ]
             
-            content.append(sales_table)
+            content.extend(self._chunked_table(table_data, [0.6*inch, 2*inch, 1.5*inch, 1*inch, 1.4*inch], self._table_styles['primary']))
+            added_body = True
         
-        # Only add spacer if we actually added content
-        if len(content) > 1:  # More than just the header
-            content.append(Spacer(1, 15))
+        # Skip sections with no data rather than rendering a lone header
+        if not added_body:
+            return []
+
+        content.append(Spacer(1, 15))
         
         return content
 
     def _create_product_section(self, insights: Dict[str, Any]) -> list:
         """Create product analysis section"""
         content = []
+        added_body = False
         
-        content.append(Paragraph("Product Performance Analysis", self.styles['SectionHeader']))
+        content.append(self._static('product_header'))
         
         # Top products
         if 'top_products' in insights and insights['top_products']:
-            content.append(Paragraph("🎯 Best Selling Products", self.styles['Normal']))
+            content.append(self._static('best_products'))
             
             headers = ['Rank', 'Product', 'Revenue', 'Units Sold', 'Avg Revenue/Sale']
-            table_data = [headers]
-            
-            for idx, product in enumerate(insights['top_products'][:10], 1):
+            products = insights['top_products'][:10]
+            # Sized up front; rows are assigned by index
+            table_data = [None] * (len(products) + 1)
+            table_data[0] = headers
+            
+            # Fields may be missing; bind dict.get once instead of looking up the method per call
+            _get = dict.get
+            # Format each currency column in one call
+            revenues = _format_currency_column(_get(product, 'total_revenue', 0) for product in products)
+            avg_revenues = _format_currency_column(_get(product, 'avg_revenue_per_sale', 0) for product in products)
+            
+            for idx, (product, total_revenue, avg_revenue_per_sale) in enumerate(zip(products, revenues, avg_revenues), 1):
                 # Safely get values with defaults
-                product_name = str(product.get('name', 'Unknown Product'))
-                total_revenue = product.get('total_revenue', 0)
-                units_sold = product.get('units_sold', 0)
-                avg_revenue_per_sale = product.get('avg_revenue_per_sale', 0)
+                product_name = str(_get(product, 'name', 'Unknown Product'))
+                units_sold = _get(product, 'units_sold', 0)
                 
                 # Truncate long product names
                 display_name = product_name[:30] + "..." if len(product_name) > 30 else product_name
                 
-                table_data.append([
-                    str(idx),
+                table_data[idx] = [
+                    f"{idx}",
                     display_name,
-                    f"${total_revenue:,.2f}",
-                    str(units_sold),
-                    f"${avg_revenue_per_sale:,.2f}"
-                ])
-            
-            products_table = Table(table_data, colWidths=[0.6*inch, 2.5*inch, 1.3*inch, 1*inch, 1.1*inch])
-            products_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), self.colors['secondary']),
-                ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
-                ('ALTERNATE', (0, 1), (-1, -1), self.colors['white']),
-                ('GRID', (0, 0), (-1, -1), 1, self.colors['secondary']),
-                ('FONTSIZE', (0, 1), (-1, -1), 9)
-            ]))
+                    total_revenue,
+                    f"{units_sold}",
+                    avg_revenue_per_sale
+                ]
             
-            content.append(products_table)
+            content.extend(self._chunked_table(table_data, [0.6*inch, 2.5*inch, 1.3*inch, 1*inch, 1.1*inch], self._table_styles['secondary']))
+            added_body = True
         
         # Category performance
         if 'revenue_by_category' in insights and insights['revenue_by_category']:
             content.append(Spacer(1, 10))
-            content.append(Paragraph("📊 Revenue by Category", self.styles['Normal']))
+            content.append(self._static('revenue_by_category'))
             
             headers = ['Category', 'Revenue', 'Transactions', 'Revenue %']
-            table_data = [headers]
-            
-            total_revenue = sum(cat.get('revenue', 0) for cat in insights['revenue_by_category'])
-            
-            for category in insights['revenue_by_category'][:8]:
-                cat_revenue = category.get('revenue', 0)
-                cat_transactions = category.get('transactions', 0)
+            # Pull each category's fields once; the total still spans every category
+            categories = [
+                (cat.get('category', 'Unknown'), cat.get('revenue', 0), cat.get('transactions', 0))
+                for cat in insights['revenue_by_category']
+            ]
+            total_revenue = sum(revenue for _, revenue, _ in categories)
+            top_categories = categories[:8]
+            
+            # Sized up front; rows are assigned by index
+            table_data = [None] * (len(top_categories) + 1)
+            table_data[0] = headers
+            
+            for idx, (cat_name, cat_revenue, cat_transactions) in enumerate(top_categories, 1):
                 revenue_percent = (cat_revenue / total_revenue * 100) if total_revenue > 0 else 0
                 
-                table_data.append([
-                    str(category.get('category', 'Unknown')),
+                table_data[idx] = [
+                    f"{cat_name}",
                     f"${cat_revenue:,.2f}",
-                    str(cat_transactions),
+                    f"{cat_transactions}",
                     f"{revenue_percent:.1f}%"
-                ])
-            
-            category_table = Table(table_data, colWidths=[2.5*inch, 1.5*inch, 1*inch, 1*inch])
-            category_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), self.colors['accent']),
-                ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
-                ('ALTERNATE', (0, 1), (-1, -1), self.colors['white']),
-                ('GRID', (0, 0), (-1, -1), 1, self.colors['accent']),
-                ('FONTSIZE', (0, 1), (-1, -1), 9)
-            ]))
+                ]
             
-            content.append(category_table)
+            content.extend(self._chunked_table(table_data, [2.5*inch, 1.5*inch, 1*inch, 1*inch], self._table_styles['accent']))
+            added_body = True
         
-        # Only add spacer if we actually added content
-        if len(content) > 1:  # More than just the header
-            content.append(Spacer(1, 15))
+        # Skip sections with no data rather than rendering a lone header
+        if not added_body:
+            return []
+
+        content.append(Spacer(1, 15))
         
         return content
 
     def _create_customer_section(self, insights: Dict[str, Any]) -> list:
         """Create customer analysis section"""
         content = []
+        added_body = False
         
-        content.append(Paragraph("Customer Analysis", self.styles['SectionHeader']))
+        content.append(self._static('customer_header'))
         
         # Top customers
         if 'top_customers' in insights and insights['top_customers']:
-            content.append(Paragraph("💎 Top Valued Customers", self.styles['Normal']))
+            content.append(self._static('top_customers'))
             
             headers = ['Rank', 'Customer', 'Total Spent', 'Transactions', 'Avg Transaction']
-            table_data = [headers]
-            
-            for idx, customer in enumerate(insights['top_customers'][:10], 1):
+            customers = insights['top_customers'][:10]
+            # Sized up front; rows are assigned by index
+            table_data = [None] * (len(customers) + 1)
+            table_data[0] = headers
+            
+            # Fields may be missing; bind dict.get once instead of looking up the method per call
+            _get = dict.get
+            # Format each currency column in one call
+            spent = _format_currency_column(_get(customer, 'total_spent', 0) for customer in customers)
+            avg_transactions = _format_currency_column(_get(customer, 'avg_transaction', 0) for customer in customers)
+            
+            for idx, (customer, total_spent, avg_transaction) in enumerate(zip(customers, spent, avg_transactions), 1):
                 # Safely get values with defaults
-                customer_name = str(customer.get('name', 'Unknown Customer'))
-                total_spent = customer.get('total_spent', 0)
-                transactions = customer.get('transactions', 0)
-                avg_transaction = customer.get('avg_transaction', 0)
+                customer_name = str(_get(customer, 'name', 'Unknown Customer'))
+                transactions = _get(customer, 'transactions', 0)
                 
                 # Truncate long customer names
                 display_name = customer_name[:25] + "..." if len(customer_name) > 25 else customer_name
                 
-                table_data.append([
-                    str(idx),
+                table_data[idx] = [
+                    f"{idx}",
                     display_name,
-                    f"${total_spent:,.2f}",
-                    str(transactions),
-                    f"${avg_transaction:,.2f}"
-                ])
-            
-            customer_table = Table(table_data, colWidths=[0.6*inch, 2.2*inch, 1.4*inch, 1*inch, 1.3*inch])
-            customer_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), self.colors['primary']),
-                ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
-                ('ALTERNATE', (0, 1), (-1, -1), self.colors['white']),
-                ('GRID', (0, 0), (-1, -1), 1, self.colors['primary']),
-                ('FONTSIZE', (0, 1), (-1, -1), 9)
-            ]))
+                    total_spent,
+                    f"{transactions}",
+                    avg_transaction
+                ]
             
-            content.append(customer_table)
+            content.extend(self._chunked_table(table_data, [0.6*inch, 2.2*inch, 1.4*inch, 1*inch, 1.3*inch], self._table_styles['primary']))
+            added_body = True
         
         # Customer insights
         if 'customer_metrics' in insights:
             content.append(Spacer(1, 10))
-            content.append(Paragraph("📈 Customer Insights", self.styles['Normal']))
+            content.append(self._static('customer_insights'))
             
             metrics = insights['customer_metrics']
             concentration = metrics.get('customer_concentration', {})
             
-            insights_text = f"""
-            <b>Key Customer Metrics:</b><br/>
-            • Average Customer Value: ${metrics.get('avg_customer_value', 0):,.2f}<br/>
-            • Median Customer Value: ${metrics.get('median_customer_value', 0):,.2f}<br/>
-            • Top Customer Value: ${metrics.get('top_customer_value', 0):,.2f}<br/>
-            • Top 10% Revenue Share: {concentration.get('top_10_percent_revenue_share', 0):.1f}%<br/>
-            • Top Customer Revenue Share: {concentration.get('top_customer_revenue_share', 0):.1f}%
-            """
-            
-            content.append(Paragraph(insights_text, self.styles['Normal']))
+            # One short Paragraph per bullet instead of a single <br/>-joined block
+            content.append(self._static('customer_metrics_heading'))
+            content.extend(self._bullets([
+                f"Average Customer Value: ${metrics.get('avg_customer_value', 0):,.2f}",
+                f"Median Customer Value: ${metrics.get('median_customer_value', 0):,.2f}",
+                f"Top Customer Value: ${metrics.get('top_customer_value', 0):,.2f}",
+                f"Top 10% Revenue Share: {concentration.get('top_10_percent_revenue_share', 0):.1f}%",
+                f"Top Customer Revenue Share: {concentration.get('top_customer_revenue_share', 0):.1f}%"
+            ]))
+            added_body = True
         
-        # Only add spacer if we actually added content
-        if len(content) > 1:  # More than just the header
-            content.append(Spacer(1, 15))
+        # Skip sections with no data rather than rendering a lone header
+        if not added_body:
+            return []
+
+        content.append(Spacer(1, 15))
         
         return content
 
@@ -521,50 +617,47 @@ class PDFExportService:
         """Create time-based analysis section"""
         content = []
         
-        content.append(Paragraph("Time-Based Analysis", self.styles['SectionHeader']))
+        content.append(self._static('time_header'))
         
         # Monthly trends
         if 'monthly_trends' in insights:
-            content.append(Paragraph("📅 Monthly Performance Trends", self.styles['Normal']))
+            content.append(self._static('monthly_trends'))
             
             headers = ['Month', 'Revenue', 'Transactions', 'Avg per Transaction']
-            table_data = [headers]
-            
-            for trend in insights['monthly_trends'][-12:]:  # Last 12 months
-                avg_per_transaction = trend['revenue'] / max(trend['transactions'], 1)
-                table_data.append([
-                    trend['month'],
-                    f"${trend['revenue']:,.2f}",
-                    str(trend['transactions']),
-                    f"${avg_per_transaction:,.2f}"
-                ])
-            
-            trends_table = Table(table_data, colWidths=[1.5*inch, 1.5*inch, 1.2*inch, 1.3*inch])
-            trends_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), self.colors['secondary']),
-                ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
-                ('ALTERNATE', (0, 1), (-1, -1), self.colors['white']),
-                ('GRID', (0, 0), (-1, -1), 1, self.colors['secondary']),
-                ('FONTSIZE', (0, 1), (-1, -1), 9)
-            ]))
+            trends = insights['monthly_trends'][-12:]  # Last 12 months
+            # Sized up front; rows are assigned by index
+            table_data = [None] * (len(trends) + 1)
+            table_data[0] = headers
+            
+            # Every month carries these keys; itemgetter unpacks them in one C call
+            month_rows = list(map(MONTH_FIELDS, trends))
+            # Averages in one vectorized division; months with no transactions divide by 1
+            revenue_values = np.fromiter((revenue for _, revenue, _ in month_rows), dtype=np.float64, count=len(month_rows))
+            transaction_counts = np.fromiter((transactions for _, _, transactions in month_rows), dtype=np.int64, count=len(month_rows))
+            avg_values = revenue_values / np.maximum(transaction_counts, 1)
+            # Format each currency column in one call
+            revenues = _format_currency_column(revenue_values.tolist())
+            avgs_per_transaction = _format_currency_column(avg_values.tolist())
+            
+            for idx, ((month, _, transactions), revenue, avg_per_transaction) in enumerate(zip(month_rows, revenues, avgs_per_transaction), 1):
+                table_data[idx] = [
+                    month,
+                    revenue,
+                    f"{transactions}",
+                    avg_per_transaction
+                ]
             
-            content.append(trends_table)
+            content.extend(self._chunked_table(table_data, [1.5*inch, 1.5*inch, 1.2*inch, 1.3*inch], self._table_styles['secondary']))
         
         # Growth metrics
         if 'growth_metrics' in insights:
             content.append(Spacer(1, 10))
             growth = insights['growth_metrics']
-            growth_text = f"""
-            <b>Growth Analysis:</b><br/>
-            • Monthly Growth Rate: {growth['monthly_growth_rate']}%<br/>
-            • Trend Direction: {growth['trend_direction'].title()}<br/>
-            """
-            content.append(Paragraph(growth_text, self.styles['Normal']))
+            content.append(self._static('growth_heading'))
+            content.extend(self._bullets([
+                f"Monthly Growth Rate: {growth['monthly_growth_rate']}%",
+                f"Trend Direction: {growth['trend_direction'].title()}"
+            ]))
         
         content.append(Spacer(1, 15))
         return content
@@ -573,38 +666,28 @@ class PDFExportService:
         """Create regional analysis section"""
         content = []
         
-        content.append(Paragraph("Regional Performance", self.styles['SectionHeader']))
+        content.append(self._static('regional_header'))
         
         if 'regional_performance' in insights:
-            content.append(Paragraph("🌍 Performance by Region", self.styles['Normal']))
+            content.append(self._static('performance_by_region'))
             
             headers = ['Region', 'Revenue', 'Market Share %', 'Transactions', 'Avg Transaction']
-            table_data = [headers]
-            
-            for region in insights['regional_performance']:
-                table_data.append([
-                    region['region'],
-                    f"${region['total_revenue']:,.2f}",
-                    f"{region['revenue_share_percent']}%",
-                    str(region['transactions']),
-                    f"${region['avg_transaction']:,.2f}"
-                ])
-            
-            regional_table = Table(table_data, colWidths=[1.5*inch, 1.3*inch, 1*inch, 1*inch, 1.2*inch])
-            regional_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), self.colors['accent']),
-                ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
-                ('ALTERNATE', (0, 1), (-1, -1), self.colors['white']),
-                ('GRID', (0, 0), (-1, -1), 1, self.colors['accent']),
-                ('FONTSIZE', (0, 1), (-1, -1), 9)
-            ]))
+            regions = insights['regional_performance']
+            # Sized up front; rows are assigned by index
+            table_data = [None] * (len(regions) + 1)
+            table_data[0] = headers
+            
+            # Every region carries these keys; itemgetter unpacks them in one C call
+            for idx, (name, total_revenue, share, transactions, avg_transaction) in enumerate(map(REGION_FIELDS, regions), 1):
+                table_data[idx] = [
+                    name,
+                    f"${total_revenue:,.2f}",
+                    f"{share}%",
+                    f"{transactions}",
+                    f"${avg_transaction:,.2f}"
+                ]
             
-            content.append(regional_table)
+            content.extend(self._chunked_table(table_data, [1.5*inch, 1.3*inch, 1*inch, 1*inch, 1.2*inch], self._table_styles['accent']))
         
         content.append(Spacer(1, 15))
         return content
@@ -613,7 +696,7 @@ class PDFExportService:
         """Create revenue distribution section"""
         content = []
         
-        content.append(Paragraph("Revenue Distribution Analysis", self.styles['SectionHeader']))
+        content.append(self._static('revenue_distribution_header'))
         
         rev_dist = insights['revenue_distribution']
         
@@ -631,18 +714,7 @@ class PDFExportService:
         ]
         
         stats_table = Table(table_data, colWidths=[2.5*inch, 2*inch])
-        stats_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), self.colors['primary']),
-            ('TEXTCOLOR', (0, 0), (-1, 0), self.colors['white']),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), self.colors['light']),
-            ('ALTERNATE', (0, 1), (-1, -1), self.colors['white']),
-            ('GRID', (0, 0), (-1, -1), 1, self.colors['primary']),
-            ('FONTSIZE', (0, 1), (-1, -1), 9)
-        ]))
+        stats_table.setStyle(self._table_styles['primary'])
         
         content.append(stats_table)
         content.append(Spacer(1, 15))
@@ -656,12 +728,6 @@ class PDFExportService:
         content.append(Spacer(1, 30))
         
         # Footer text
-        footer_text = f"""
-        <b>Report generated by AI Data Analyst</b><br/>
-        This automated analysis provides insights based on your data patterns and trends.<br/>
-        For questions or additional analysis, please contact support.
-        """
-        
-        content.append(Paragraph(footer_text, self.styles['SmallText']))
+        content.append(self._static('footer'))
         
         return content
\ No newline at end of file
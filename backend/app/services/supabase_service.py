@@ -1,126 +1,497 @@
-from supabase import create_client, Client
+from supabase import acreate_client, AsyncClient, AsyncClientOptions
+from postgrest.types import CountMethod, ReturnMethod
 from app.config.settings import settings
 from app.utils.logger import logger
 from fastapi import HTTPException
-import datetime
-from datetime import timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from collections import OrderedDict
+from functools import partial
+from operator import itemgetter
+from urllib.parse import unquote, urlparse
+from datetime import datetime
+from uuid import UUID
+import asyncio
+import asyncpg
+import httpx
+import mimetypes
+import orjson
+import time
+
+# Hot metadata reads are served from memory briefly; writes through this service drop the affected entries
+READ_CACHE_TTL_SECONDS = 30
+READ_CACHE_MAX_ENTRIES = 1024
+
+# Shared by PostgREST and storage: HTTP/2 multiplexes concurrent calls over warm keep-alive connections
+HTTP_POOL_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=30)
+POSTGREST_TIMEOUT_SECONDS = 10
+STORAGE_TIMEOUT_SECONDS = 30
+
+# The pinned storage3 returns create_signed_url results as a dict keyed by signedURL
+_parse_signed_url = itemgetter("signedURL")
+
+# The file list pages by created_at and only carries what the dashboard shows
+FILE_LIST_COLUMNS = "id, filename, file_size, file_type, status, created_at, analysis_id"
+FILE_LIST_PAGE_SIZE = 50
+
+# Direct Postgres pool for the hot lookups. Supavisor's transaction mode can hand each
+# statement a different backend, so asyncpg's named prepared statements are disabled
+PG_POOL_MIN_SIZE = 2
+PG_POOL_MAX_SIZE = 20
+
+async def _init_pg_connection(conn: asyncpg.Connection):
+    await conn.set_type_codec("jsonb", encoder=lambda v: orjson.dumps(v).decode(), decoder=orjson.loads, schema="pg_catalog")
+
+def _canonical_id(value: str) -> Optional[str]:
+    """Lowercase hyphenated form that Postgres returns ids in; None when the value is not a UUID"""
+    try:
+        return str(UUID(value))
+    except ValueError:
+        return None
+
+def _pg_row(record: asyncpg.Record) -> dict:
+    """Shape a Postgres row like PostgREST's JSON: UUIDs and timestamps as strings"""
+    return {
+        key: str(value) if isinstance(value, UUID) else value.isoformat() if isinstance(value, datetime) else value
+        for key, value in record.items()
+    }
+
+# Single-file lookups skip user_id, which the caller already has
+FILE_COLUMNS = "id, filename, file_path, file_size, file_type, status, analysis_id, created_at"
+# Chat and PDF export only need the insights, not the raw_text sample
+ANALYSIS_INSIGHTS_COLUMNS = "id, file_id, description, insights, created_at"
+
+# Chat history is trimmed to 100 messages / 30 days in the background every few saves
+CHAT_PRUNE_EVERY = 10
+CHAT_PRUNE_TRACKED_MAX = 4096
+
+SIGNED_URL_PATH_PREFIX = "/storage/v1/object/sign/spreadsheets/"
+
+def _auth_headers(**extra: str) -> Dict[str, str]:
+    """Service-key headers for the raw storage and PostgREST calls made outside supabase-py"""
+    return {
+        "Authorization": f"Bearer {settings.supabase_key}",
+        "apikey": settings.supabase_key,
+        **extra
+    }
+
+class SupabaseRESTError(Exception):
+    """Non-2xx response from a raw PostgREST call"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(f"PostgREST {status_code}: {detail}")
+        self.status_code = status_code
+        self.detail = detail
+
+    @property
+    def http_status(self) -> int:
+        # A rejected request (bad filter, constraint violation) is the caller's 400; anything else is upstream
+        return 400 if 400 <= self.status_code < 500 else 502
+
+def _object_key(user_id: str, file_name: str) -> str:
+    """Storage object key for a user's file, stored as uploaded_files.file_path_key"""
+    return f"{user_id}/{file_name}"
+
+def _storage_key(file_path: str) -> str:
+    """Rows saved before file_path_key existed only have the signed URL, so recover the key from its path"""
+    if file_path.startswith(("http://", "https://")):
+        return unquote(urlparse(file_path).path.removeprefix(SIGNED_URL_PATH_PREFIX))
+    return file_path
+
+def _file_row(file_name: str, file_url: str, user_id: str, file_size: int, file_type: str) -> dict:
+    return {
+        "filename": file_name,
+        "file_path": file_url,
+        "file_path_key": _object_key(user_id, file_name),
+        "user_id": user_id,
+        "file_size": file_size,
+        "file_type": file_type,
+        "status": "uploaded"
+    }
+
+# Content type per file extension, guessed once
+_MIME_CACHE: Dict[str, str] = {}
+
+def _content_type(file_name: str) -> str:
+    ext = file_name.rpartition(".")[2].lower()
+    content_type = _MIME_CACHE.get(ext)
+    if content_type is None:
+        content_type = _MIME_CACHE[ext] = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    return content_type
+
+# Lookups arriving within this window are fetched together with one IN query
+BATCH_WINDOW_SECONDS = 0.005
+BATCH_MAX_SIZE = 100
+
+class _BatchLoader:
+    """Coalesces concurrent single-row lookups per group (the user) into one query, DataLoader style"""
+
+    def __init__(self, batch_load_fn: Callable[[str, List[str]], Awaitable[Dict[str, dict]]]):
+        self._batch_load_fn = batch_load_fn
+        self._pending: Dict[str, Dict[str, List[asyncio.Future]]] = {}
+        # The loop only holds weak references to tasks; keep in-flight dispatches alive
+        self._dispatch_tasks: set = set()
+
+    async def load(self, group: str, key: str) -> Optional[dict]:
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(group)
+        if batch is None:
+            batch = self._pending[group] = {}
+            loop.call_later(BATCH_WINDOW_SECONDS, self._schedule_dispatch, group, batch)
+        future = loop.create_future()
+        batch.setdefault(key, []).append(future)
+        if len(batch) >= BATCH_MAX_SIZE:
+            self._schedule_dispatch(group, batch)
+        return await future
+
+    def _schedule_dispatch(self, group: str, batch: Dict[str, List[asyncio.Future]]):
+        # The timer and the size limit can both fire for one batch; only the first dispatches it
+        if self._pending.get(group) is batch:
+            del self._pending[group]
+            task = asyncio.ensure_future(self._dispatch(group, batch))
+            self._dispatch_tasks.add(task)
+            task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self, group: str, batch: Dict[str, List[asyncio.Future]]):
+        try:
+            rows = await self._batch_load_fn(group, list(batch))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for key, futures in batch.items():
+            row = rows.get(key)
+            for future in futures:
+                if not future.done():
+                    future.set_result(row)
 
 class SupabaseService:
     def __init__(self):
-        self.client: Client = create_client(settings.supabase_url, settings.supabase_key)
+        # Created in connect() at startup; the async client's factory is a coroutine
+        self.client: Optional[AsyncClient] = None
+        # Storage uploads go straight to the REST endpoint so the body can be streamed
+        self.storage_url = f"{settings.supabase_url}/storage/v1"
+        # As do the large file_analyses reads and writes, so their JSON goes through orjson
+        self.rest_url = f"{settings.supabase_url}/rest/v1"
+        self.http_client = httpx.AsyncClient(http2=True, limits=HTTP_POOL_LIMITS, timeout=60.0)
+        self._supabase_http: Optional[httpx.AsyncClient] = None
+        self.pg: Optional[asyncpg.Pool] = None
+        # Keys always include user_id so one user's rows are never served to another
+        self._read_cache: OrderedDict = OrderedDict()
+        self._file_loader = _BatchLoader(self._load_files)
+        self._analysis_loader = _BatchLoader(partial(self._load_analyses, "*"))
+        self._analysis_insights_loader = _BatchLoader(partial(self._load_analyses, ANALYSIS_INSIGHTS_COLUMNS))
+        # Saves since the last prune, per (file_id, user_id)
+        self._chat_saves: OrderedDict = OrderedDict()
+        self._background_tasks: set = set()
+
+    async def connect(self):
+        """Create the async Supabase client so database and storage calls don't block the event loop"""
+        if self.client is None:
+            self._supabase_http = httpx.AsyncClient(
+                http2=True,
+                limits=HTTP_POOL_LIMITS,
+                timeout=STORAGE_TIMEOUT_SECONDS,
+                headers={"Connection": "keep-alive"}
+            )
+            options = AsyncClientOptions(
+                postgrest_client_timeout=POSTGREST_TIMEOUT_SECONDS,
+                storage_client_timeout=STORAGE_TIMEOUT_SECONDS,
+                httpx_client=self._supabase_http
+            )
+            self.client = await acreate_client(settings.supabase_url, settings.supabase_key, options=options)
+            logger.info("Supabase client connected")
+        if self.pg is None and settings.database_url:
+            self.pg = await asyncpg.create_pool(
+                settings.database_url,
+                min_size=PG_POOL_MIN_SIZE,
+                max_size=PG_POOL_MAX_SIZE,
+                statement_cache_size=0,
+                init=_init_pg_connection
+            )
+            logger.info("Postgres pool connected")
+
+    async def warm_up(self):
+        """Open the PostgREST and storage connections before the first request needs them"""
+        try:
+            await asyncio.gather(
+                self.client.from_("uploaded_files").select("id").limit(1).execute(),
+                self.client.storage.list_buckets()
+            )
+            logger.info("Supabase connections warmed up")
+        except Exception as e:
+            # Not fatal: requests will open the connections themselves
+            logger.warning("Supabase warm-up failed", error=str(e))
+
+    async def close(self):
+        await self.http_client.aclose()
+        if self._supabase_http is not None:
+            await self._supabase_http.aclose()
+        if self.pg is not None:
+            await self.pg.close()
+
+    def _get_cached(self, key: tuple):
+        entry = self._read_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._read_cache[key]
+            return None
+        self._read_cache.move_to_end(key)
+        return value
+
+    def _set_cached(self, key: tuple, value):
+        self._read_cache[key] = (time.monotonic() + READ_CACHE_TTL_SECONDS, value)
+        self._read_cache.move_to_end(key)
+        while len(self._read_cache) > READ_CACHE_MAX_ENTRIES:
+            self._read_cache.popitem(last=False)
 
-    async def upload_file(self, file: bytes, file_name: str, user_id: str) -> str:
+    async def _load_files(self, user_id: str, file_ids: List[str]) -> Dict[str, dict]:
+        if self.pg is not None:
+            records = await self.pg.fetch(
+                f"SELECT {FILE_COLUMNS} FROM uploaded_files WHERE id = ANY($1::uuid[]) AND user_id = $2::uuid",
+                file_ids, user_id
+            )
+            return {row["id"]: row for row in map(_pg_row, records)}
+        response = await self.client.from_("uploaded_files").select(FILE_COLUMNS).in_("id", file_ids).eq("user_id", user_id).execute()
+        return {row["id"]: row for row in response.data or []}
+
+    async def _rest(self, method: str, table: str, *, params: Optional[dict] = None, body: Optional[dict] = None,
+                    prefer: str = "return=representation") -> list:
+        """PostgREST call with orjson on both ends; the insight payloads are the largest JSON the service moves"""
+        headers = _auth_headers(**{"Content-Type": "application/json", "Prefer": prefer})
+        response = await self.http_client.request(
+            method,
+            f"{self.rest_url}/{table}",
+            params=params,
+            content=orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY) if body is not None else None,
+            headers=headers
+        )
+        if response.is_error:
+            raise SupabaseRESTError(response.status_code, response.text)
+        return orjson.loads(response.content)
+
+    async def _load_analyses(self, columns: str, user_id: str, file_ids: List[str]) -> Dict[str, dict]:
+        # Oldest first, so the latest analysis of a file wins
+        if self.pg is not None:
+            records = await self.pg.fetch(
+                f"SELECT {columns} FROM file_analyses WHERE file_id = ANY($1::uuid[]) AND user_id = $2::uuid ORDER BY created_at",
+                file_ids, user_id
+            )
+            return {row["file_id"]: row for row in map(_pg_row, records)}
+        rows = await self._rest("GET", "file_analyses", params={
+            "select": columns,
+            "file_id": f"in.({','.join(file_ids)})",
+            "user_id": f"eq.{user_id}",
+            "order": "created_at"
+        })
+        return {row["file_id"]: row for row in rows}
+
+    def _invalidate(self, user_id: str, file_id: Optional[str] = None):
+        """Drop cached reads touched by a write: the user's file list and, if given, that file's rows"""
+        self._read_cache.pop(("files", user_id), None)
+        if file_id is not None:
+            file_id = _canonical_id(file_id) or file_id
+            self._read_cache.pop(("file", user_id, file_id), None)
+            self._read_cache.pop(("analysis", user_id, file_id), None)
+            self._read_cache.pop(("analysis_insights", user_id, file_id), None)
+
+    async def upload_file(self, file: AsyncIterator[bytes], file_name: str, user_id: str, file_size: Optional[int] = None) -> str:
         try:
             bucket = "spreadsheets"
-            file_path = f"{user_id}/{file_name}"
+            file_path = _object_key(user_id, file_name)
             
-            # Proper MIME type detection
-            import mimetypes
-            content_type, _ = mimetypes.guess_type(file_name)
-            if not content_type:
-                content_type = "application/octet-stream"
+            content_type = _content_type(file_name)
             
-            response = self.client.storage.from_(bucket).upload(
-                file_path,
-                file,
-                file_options={"content-type": content_type}
+            # Same name replaces the stored object, matching the metadata upsert
+            headers = _auth_headers(**{"Content-Type": content_type, "x-upsert": "true"})
+            if file_size is not None:
+                headers["Content-Length"] = str(file_size)
+
+            # Stream the body chunk by chunk instead of holding the whole file in memory
+            response = await self.http_client.post(
+                f"{self.storage_url}/object/{bucket}/{file_path}",
+                content=file,
+                headers=headers
             )
             
             # Check upload success
-            if hasattr(response, 'error') and response.error:
-                raise HTTPException(status_code=400, detail=f"Upload failed: {response.error}")
-            
-            # Generate signed URL - check actual response structure
-            signed_url_response = self.client.storage.from_(bucket).create_signed_url(file_path, expires_in=3600)
-            
-            # Handle different possible response structures
-            if isinstance(signed_url_response, str):
-                file_url = signed_url_response
-            elif isinstance(signed_url_response, dict):
-                file_url = signed_url_response.get('signedURL') or signed_url_response.get('signed_url')
-                if not file_url:
-                    raise HTTPException(status_code=500, detail="Failed to generate signed URL")
-            else:
-                raise HTTPException(status_code=500, detail="Unexpected signed URL response format")
+            if response.is_error:
+                raise HTTPException(status_code=400, detail=f"Upload failed: {response.text}")
             
+            file_url = await self._create_signed_url(bucket, file_path)
             logger.info("File uploaded successfully", file_name=file_name, user_id=user_id, file_url=file_url)
             return file_url
             
+        except HTTPException as e:
+            raise e
         except Exception as e:
             logger.error("File upload failed", error=str(e), file_name=file_name, user_id=user_id)
             raise HTTPException(status_code=500, detail=f"File upload error: {str(e)}")
 
+    async def create_upload_url(self, file_name: str, user_id: str) -> dict:
+        """Signed upload URL so the client can PUT the file straight to storage instead of through the API"""
+        try:
+            file_path = _object_key(user_id, file_name)
+            response = await self.client.storage.from_("spreadsheets").create_signed_upload_url(file_path)
+            logger.info("Created signed upload URL", file_name=file_name, user_id=user_id)
+            return {"upload_url": response["signed_url"], "token": response["token"], "path": file_path}
+        except Exception as e:
+            logger.error("Failed to create upload URL", error=str(e), file_name=file_name, user_id=user_id)
+            raise HTTPException(status_code=500, detail=f"Failed to create upload URL: {str(e)}")
+
+    async def complete_upload(self, file_name: str, user_id: str, file_size: int) -> str:
+        """Check a directly uploaded file against the declared size and limit, then return its signed download URL"""
+        bucket = "spreadsheets"
+        file_path = _object_key(user_id, file_name)
+        try:
+            # The client chose what to PUT, so trust the stored object's size, not the declared one
+            stored_size = await self._stored_size(bucket, file_path)
+            if stored_size is None:
+                raise HTTPException(status_code=404, detail="Uploaded file not found")
+            if stored_size > settings.max_file_size or stored_size != file_size:
+                await self.client.storage.from_(bucket).remove([file_path])
+                logger.warning("Rejected direct upload", file_name=file_name, user_id=user_id,
+                               declared_size=file_size, stored_size=stored_size)
+                if stored_size > settings.max_file_size:
+                    raise HTTPException(status_code=413, detail="File size exceeds limit")
+                raise HTTPException(status_code=400, detail="Uploaded file size does not match the declared size")
+            return await self._create_signed_url(bucket, file_path)
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            logger.error("Failed to complete upload", error=str(e), file_name=file_name, user_id=user_id)
+            raise HTTPException(status_code=500, detail=f"File upload error: {str(e)}")
+
+    async def _stored_size(self, bucket: str, file_path: str) -> Optional[int]:
+        """Size in bytes of a stored object, or None if it doesn't exist"""
+        response = await self.http_client.head(
+            f"{self.storage_url}/object/authenticated/{bucket}/{file_path}",
+            headers=_auth_headers()
+        )
+        # Storage answers a missing object with 400 or 404 depending on version
+        if response.status_code in (400, 404):
+            return None
+        response.raise_for_status()
+        return int(response.headers["content-length"])
+
+    async def remove_files(self, user_id: str, file_names: List[str]):
+        """Best-effort removal of stored objects, e.g. to roll back a failed batch upload"""
+        if not file_names:
+            return
+        try:
+            await self.client.storage.from_("spreadsheets").remove([_object_key(user_id, name) for name in file_names])
+            logger.info("Removed stored files", user_id=user_id, file_count=len(file_names))
+        except Exception as e:
+            logger.error("Failed to remove stored files", error=str(e), user_id=user_id, file_names=file_names)
+
+    async def _create_signed_url(self, bucket: str, file_path: str) -> str:
+        signed_url_response = await self.client.storage.from_(bucket).create_signed_url(file_path, expires_in=3600)
+        try:
+            return _parse_signed_url(signed_url_response)
+        except (KeyError, TypeError):
+            raise HTTPException(status_code=500, detail="Failed to generate signed URL")
+
     async def save_file_metadata(self, file_name: str, file_url: str, user_id: str, file_size: int, file_type: str):
         try:
-            data = {
-                "filename": file_name,
-                "file_path": file_url,
-                "user_id": user_id,
-                "file_size": file_size,
-                "file_type": file_type,
-                "status": "uploaded"
-            }
-            response = self.client.from_("uploaded_files").insert(data).execute()
-            if response.data:
-                logger.info("File metadata saved", file_name=file_name, user_id=user_id)
-                return response.data
-            else:
-                raise Exception("Failed to save file metadata: No data returned")
+            rows = await self._upsert_file_rows(user_id, [
+                _file_row(file_name, file_url, user_id, file_size, file_type)
+            ])
+            logger.info("File metadata saved", file_name=file_name, user_id=user_id)
+            return rows
         except Exception as e:
             logger.error("Failed to save file metadata", error=str(e), file_name=file_name, user_id=user_id)
             raise HTTPException(status_code=500, detail=f"Failed to save file metadata: {str(e)}")
 
-    async def list_user_files(self, user_id: str):
+    async def save_file_metadata_bulk(self, user_id: str, files: List[dict]):
+        """Save several uploads' metadata with one multi-row insert; each dict has file_name, file_url, file_size, file_type"""
         try:
-            response = self.client.from_("uploaded_files").select("*").eq("user_id", user_id).execute()
-            if response.data is not None:
-                logger.info("Retrieved user files", user_id=user_id, file_count=len(response.data))
-                return response.data
-            else:
-                logger.info("No files found for user", user_id=user_id)
-                return []
+            rows = await self._upsert_file_rows(user_id, [
+                _file_row(f["file_name"], f["file_url"], user_id, f["file_size"], f["file_type"]) for f in files
+            ])
+            logger.info("File metadata saved", file_count=len(rows), user_id=user_id)
+            return rows
+        except Exception as e:
+            logger.error("Failed to save file metadata", error=str(e), file_count=len(files), user_id=user_id)
+            raise HTTPException(status_code=500, detail=f"Failed to save file metadata: {str(e)}")
+
+    async def _upsert_file_rows(self, user_id: str, data: List[dict]) -> list:
+        # Re-uploading a file name updates its existing row rather than orphaning it
+        response = await self.client.from_("uploaded_files").upsert(data, on_conflict="user_id,filename").execute()
+        self._invalidate(user_id)
+        for row in response.data or []:
+            self._invalidate(user_id, row["id"])
+        if not response.data:
+            raise Exception("Failed to save file metadata: No data returned")
+        return response.data
+
+    async def list_user_files(self, user_id: str, cursor: Optional[str] = None, limit: int = FILE_LIST_PAGE_SIZE) -> dict:
+        """Newest files first, one page at a time; pass the returned next_cursor to get the following page"""
+        # Only the default first page is cached, so invalidating ("files", user_id) covers it
+        cache_key = ("files", user_id) if cursor is None and limit == FILE_LIST_PAGE_SIZE else None
+        if cache_key is not None:
+            cached = self._get_cached(cache_key)
+            if cached is not None:
+                return cached
+        try:
+            query = self.client.from_("uploaded_files").select(FILE_LIST_COLUMNS).eq("user_id", user_id) \
+                .order("created_at", desc=True).limit(limit)
+            if cursor:
+                query = query.lt("created_at", cursor)
+            response = await query.execute()
+            files = response.data or []
+            page = {
+                "items": files,
+                "next_cursor": files[-1]["created_at"] if len(files) == limit else None
+            }
+            logger.info("Retrieved user files", user_id=user_id, file_count=len(files))
+            if cache_key is not None:
+                self._set_cached(cache_key, page)
+            return page
         except Exception as e:
             logger.error("Failed to list user files", error=str(e), user_id=user_id)
             raise HTTPException(status_code=500, detail=f"Failed to list files: {str(e)}")
 
     async def get_file_by_id(self, file_id: str, user_id: str):
+        # A malformed id cannot match a row, and must not join a batch where it would fail the whole query
+        file_id = _canonical_id(file_id)
+        if file_id is None:
+            raise HTTPException(status_code=404, detail="File not found")
+        cache_key = ("file", user_id, file_id)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            return cached
         try:
-            response = self.client.from_("uploaded_files").select("*").eq("id", file_id).eq("user_id", user_id).single().execute()
-            if response.data:
+            file = await self._file_loader.load(user_id, file_id)
+            if file:
                 logger.info("Retrieved file by ID", file_id=file_id, user_id=user_id)
-                return response.data
+                self._set_cached(cache_key, file)
+                return file
             else:
                 raise HTTPException(status_code=404, detail="File not found")
+        except HTTPException as e:
+            raise e
         except Exception as e:
             logger.error("Failed to retrieve file by ID", error=str(e), file_id=file_id, user_id=user_id)
             raise HTTPException(status_code=500, detail=f"Failed to retrieve file: {str(e)}")
 
     async def delete_file(self, file_id: str, user_id: str):
         try:
-            # Get file metadata to obtain file_path
-            file = await self.get_file_by_id(file_id, user_id)
-            file_path = file["file_path"].split("?")[0].split("spreadsheets/")[1]  # Extract path from signed URL
-
-            # Delete chat history
-            self.client.from_("chat_history").delete().eq("file_id", file_id).eq("user_id", user_id).execute()
-            logger.info("Chat history deleted", file_id=file_id, user_id=user_id)
-
-            # Clear analysis_id in uploaded_files to avoid foreign key violation
-            self.client.from_("uploaded_files").update({"analysis_id": None}).eq("id", file_id).eq("user_id", user_id).execute()
-            logger.info("Cleared analysis_id in uploaded_files", file_id=file_id, user_id=user_id)
-
-            # Delete analysis
-            self.client.from_("file_analyses").delete().eq("file_id", file_id).eq("user_id", user_id).execute()
-            logger.info("File analysis deleted", file_id=file_id, user_id=user_id)
-
-            # Delete file metadata
-            response = self.client.from_("uploaded_files").delete().eq("id", file_id).eq("user_id", user_id).execute()
+            # Chat history, analysis and metadata go in one transaction on the database side; returns the object key
+            response = await self.client.rpc(
+                "delete_file_cascade", {"p_file_id": file_id, "p_user_id": user_id}
+            ).execute()
+            self._invalidate(user_id, file_id)
             if not response.data:
                 raise HTTPException(status_code=404, detail="File not found")
-            logger.info("File metadata deleted", file_id=file_id, user_id=user_id)
+            logger.info("File records deleted", file_id=file_id, user_id=user_id)
+
+            file_path = _storage_key(response.data[0]["file_path_key"])
 
             # Delete file from storage
-            self.client.storage.from_("spreadsheets").remove([file_path])
+            await self.client.storage.from_("spreadsheets").remove([file_path])
             logger.info("File deleted from storage", file_id=file_id, user_id=user_id, file_path=file_path)
 
             return {"message": "File and associated data deleted successfully"}
@@ -132,10 +503,13 @@ class SupabaseService:
 
     async def update_file_status(self, file_id: str, user_id: str, status: str):
         try:
-            response = self.client.from_("uploaded_files").update({"status": status}).eq("id", file_id).eq("user_id", user_id).execute()
-            if response.data:
+            # No row echoed back; the exact count is enough to detect a missing file
+            response = await self.client.from_("uploaded_files").update(
+                {"status": status}, count=CountMethod.exact, returning=ReturnMethod.minimal
+            ).eq("id", file_id).eq("user_id", user_id).execute()
+            self._invalidate(user_id, file_id)
+            if response.count:
                 logger.info("File status updated", file_id=file_id, user_id=user_id, status=status)
-                return response.data
             else:
                 raise HTTPException(status_code=404, detail="File not found")
         except Exception as e:
@@ -153,55 +527,64 @@ class SupabaseService:
                 "insights": insights,
                 "status": "completed"
             }
-            response = self.client.from_("file_analyses").insert(data).execute()
-            if not response.data:
+            # Re-analysing a file replaces its analysis row in place instead of adding another
+            rows = await self._rest(
+                "POST", "file_analyses",
+                params={"on_conflict": "file_id,user_id"},
+                body=data,
+                prefer="resolution=merge-duplicates,return=representation"
+            )
+            # Also covers the file row, whose analysis_id the trigger just set
+            self._invalidate(user_id, file_id)
+            if not rows:
                 raise Exception("Failed to save analysis result: No data returned")
             
-            analysis_id = response.data[0]["id"]
-            logger.info("Analysis result saved", file_id=file_id, user_id=user_id, analysis_id=analysis_id)
-
-            # Update uploaded_files with analysis_id
-            update_response = self.client.from_("uploaded_files").update({"analysis_id": analysis_id}).eq("id", file_id).eq("user_id", user_id).execute()
-            if not update_response.data:
-                raise Exception("Failed to update analysis_id in uploaded_files")
-
-            logger.info("Updated analysis_id in uploaded_files", file_id=file_id, analysis_id=analysis_id)
-            return response.data
+            # The link_analysis_to_file trigger sets uploaded_files.analysis_id in the same statement
+            logger.info("Analysis result saved", file_id=file_id, user_id=user_id, analysis_id=rows[0]["id"])
+            return rows
+        except SupabaseRESTError as e:
+            logger.error("Failed to save analysis result", error=str(e), status_code=e.status_code, file_id=file_id, user_id=user_id)
+            raise HTTPException(status_code=e.http_status, detail=f"Failed to save analysis result: {e.detail}")
         except Exception as e:
             logger.error("Failed to save analysis result", error=str(e), file_id=file_id, user_id=user_id)
             raise HTTPException(status_code=500, detail=f"Failed to save analysis result: {str(e)}")
 
     async def get_analysis_by_file_id(self, file_id: str, user_id: str):
+        """Full analysis row, including the raw_text sample"""
+        return await self._get_analysis(self._analysis_loader, ("analysis", user_id, file_id))
+
+    async def get_analysis_insights_by_file_id(self, file_id: str, user_id: str):
+        """Analysis without the raw_text sample, for chat and PDF export"""
+        return await self._get_analysis(self._analysis_insights_loader, ("analysis_insights", user_id, file_id))
+
+    async def _get_analysis(self, loader: _BatchLoader, cache_key: tuple):
+        kind, user_id, file_id = cache_key
+        file_id = _canonical_id(file_id)
+        if file_id is None:
+            raise HTTPException(status_code=404, detail="Analysis not found")
+        cache_key = (kind, user_id, file_id)
+        cached = self._get_cached(cache_key)
+        if cached is not None:
+            return cached
         try:
-            response = self.client.from_("file_analyses").select("*").eq("file_id", file_id).eq("user_id", user_id).single().execute()
-            if response.data:
+            analysis = await loader.load(user_id, file_id)
+            if analysis:
                 logger.info("Retrieved analysis by file ID", file_id=file_id, user_id=user_id)
-                return response.data
+                self._set_cached(cache_key, analysis)
+                return analysis
             else:
                 raise HTTPException(status_code=404, detail="Analysis not found")
+        except HTTPException as e:
+            raise e
+        except SupabaseRESTError as e:
+            logger.error("Failed to retrieve analysis", error=str(e), status_code=e.status_code, file_id=file_id, user_id=user_id)
+            raise HTTPException(status_code=e.http_status, detail=f"Failed to retrieve analysis: {e.detail}")
         except Exception as e:
             logger.error("Failed to retrieve analysis", error=str(e), file_id=file_id, user_id=user_id)
             raise HTTPException(status_code=500, detail=f"Failed to retrieve analysis: {str(e)}")
         
     async def save_chat_history(self, file_id: str, analysis_id: str, user_id: str, question: str, answer: str):
         try:
-            # Enforce message count limit (100 messages per file)
-            count_response = self.client.from_("chat_history").select("id", count="exact").eq("file_id", file_id).eq("user_id", user_id).execute()
-            message_count = count_response.count if count_response.count is not None else 0
-            if message_count >= 100:
-                # Delete oldest messages to keep under limit
-                oldest_response = self.client.from_("chat_history").select("id").eq("file_id", file_id).eq("user_id", user_id).order("created_at").limit(message_count - 99).execute()
-                if oldest_response.data:
-                    oldest_ids = [record["id"] for record in oldest_response.data]
-                    self.client.from_("chat_history").delete().in_("id", oldest_ids).execute()
-                    logger.info("Deleted oldest chat messages to enforce limit", file_id=file_id, user_id=user_id, deleted_count=len(oldest_ids))
-
-            # Enforce time-based limit (30 days)
-            # 🐛 FIX: Calculate the date 30 days ago in Python instead of passing a raw SQL string.
-            thirty_days_ago = datetime.datetime.now() - timedelta(days=30)
-            self.client.from_("chat_history").delete().eq("file_id", file_id).eq("user_id", user_id).lt("created_at", thirty_days_ago).execute()
-
-            # Insert new chat history
             data = {
                 "file_id": file_id,
                 "analysis_id": analysis_id,
@@ -209,20 +592,37 @@ class SupabaseService:
                 "question": question,
                 "answer": answer
             }
-            response = self.client.from_("chat_history").insert(data).execute()
-            if response.data:
-                logger.info("Chat history saved", file_id=file_id, user_id=user_id)
-                return response.data
-            else:
-                raise Exception("Failed to save chat history: No data returned")
+            # Callers don't use the saved row, so don't have it echoed back
+            await self.client.from_("chat_history").insert(data, returning=ReturnMethod.minimal).execute()
+            logger.info("Chat history saved", file_id=file_id, user_id=user_id)
+            self._schedule_chat_prune(file_id, user_id)
         except Exception as e:
             logger.error("Failed to save chat history", error=str(e), file_id=file_id, user_id=user_id)
             raise HTTPException(status_code=500, detail=f"Failed to save chat history: {str(e)}")
 
+    def _schedule_chat_prune(self, file_id: str, user_id: str):
+        """Trim a file's history every CHAT_PRUNE_EVERY saves, after the response instead of on every insert"""
+        key = (file_id, user_id)
+        count = self._chat_saves.pop(key, 0) + 1
+        if count < CHAT_PRUNE_EVERY:
+            self._chat_saves[key] = count
+            while len(self._chat_saves) > CHAT_PRUNE_TRACKED_MAX:
+                self._chat_saves.popitem(last=False)
+            return
+        task = asyncio.create_task(self._prune_chat_history(file_id, user_id))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _prune_chat_history(self, file_id: str, user_id: str):
+        try:
+            await self.client.rpc("prune_chat_history", {"p_file_id": file_id, "p_user_id": user_id}).execute()
+            logger.info("Pruned chat history", file_id=file_id, user_id=user_id)
+        except Exception as e:
+            logger.warning("Failed to prune chat history", error=str(e), file_id=file_id, user_id=user_id)
 
     async def get_chat_history(self, file_id: str, user_id: str):
         try:
-            response = self.client.from_("chat_history").select("question, answer, created_at").eq("file_id", file_id).eq("user_id", user_id).order("created_at").execute()
+            response = await self.client.from_("chat_history").select("question, answer, created_at").eq("file_id", file_id).eq("user_id", user_id).order("created_at").execute()
             if response.data is not None:
                 logger.info("Retrieved chat history", file_id=file_id, user_id=user_id, message_count=len(response.data))
                 return response.data
@@ -1,8 +1,9 @@
 import asyncio
+import os
 from together import AsyncTogether
 
 async def test_together():
-    client = AsyncTogether(api_key="7b2da4d4e07796fad4c99f6e62cb4fa82bf98d843a60a9174be2dc6492809ab0")
+    client = AsyncTogether(api_key=os.environ["TOGETHER_API_KEY"])
     try:
         response = await client.chat.completions.create(
             model="mistralai/Mixtral-8x7B-Instruct-v0.1",
@@ -13,4 +14,5 @@ async def test_together():
     except Exception as e:
         print("Error:", e)
 
-asyncio.run(test_together())
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(test_together())
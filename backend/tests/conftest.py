@@ -0,0 +1,13 @@
+import os
+
+# Settings are read at import; give the required fields dummy values so services import without a .env
+for name, value in {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_KEY": "test-key",
+    "SUPABASE_JWT_SECRET": "test-secret",
+    "ALLOWED_FILE_TYPES": "csv,xlsx,xls",
+    "MAX_FILE_SIZE": "10485760",
+    "ALLOWED_ORIGINS": "http://localhost:3000",
+    "TOGETHER_API_KEY": "test-key",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,47 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.services.langgraph_service import FALLBACK_INSIGHTS, LangGraphService
+
+
+class _StubCompletions:
+    """Answers each insight prompt by its JSON key; keys in `failing` raise instead"""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+
+    async def create(self, messages, **kwargs):
+        system_prompt = messages[0]["content"]
+        key = next(k for k in ("trends", "anomalies", "predictions") if f"'{k}'" in system_prompt)
+        if key in self.failing:
+            raise RuntimeError(f"{key} call failed")
+        content = json.dumps({key: [f"stub {key}"]})
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def _service(completions: _StubCompletions) -> LangGraphService:
+    service = LangGraphService()
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return service
+
+
+def test_failed_node_keeps_other_insights():
+    service = _service(_StubCompletions(failing={"predictions"}))
+
+    insights = asyncio.run(service.generate_insights("a,b\n1,2", "two columns"))
+
+    assert insights["trends"] == ["stub trends"]
+    assert insights["anomalies"] == ["stub anomalies"]
+    assert insights["predictions"] == FALLBACK_INSIGHTS["predictions"]
+
+
+def test_failed_node_is_not_cached():
+    completions = _StubCompletions(failing={"predictions"})
+    service = _service(completions)
+    asyncio.run(service.generate_insights("a,b\n1,2", "two columns"))
+
+    completions.failing.clear()
+    insights = asyncio.run(service.generate_insights("a,b\n1,2", "two columns"))
+
+    assert insights["predictions"] == ["stub predictions"]
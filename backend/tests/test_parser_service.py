@@ -0,0 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app.services import parser_service
+from app.services.parser_service import ParserService
+
+
+def test_numba_stats_from_concurrent_parser_threads(monkeypatch):
+    # Force the Numba path on a small frame and enter it from two threads at once,
+    # as two large sheets parsed side by side would
+    monkeypatch.setattr(parser_service, "NUMBA_MIN_CELLS", 0)
+    service = ParserService()
+    df = pd.DataFrame({"a": np.arange(10_000, dtype=np.float64), "b": np.ones(10_000)})
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = list(pool.map(lambda _: service._numeric_stats(df, ["a", "b"]), range(8)))
+
+    for stats in results:
+        assert stats == [("a", 0.0, 9999.0, 4999.5), ("b", 1.0, 1.0, 1.0)]
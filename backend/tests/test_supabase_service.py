@@ -0,0 +1,55 @@
+import asyncio
+from uuid import UUID
+
+import pytest
+from fastapi import HTTPException
+
+from app.services.supabase_service import SupabaseService, _BatchLoader
+
+FILE_ID = "3f2b8c1e-9a4d-4e6f-8b7a-1c2d3e4f5a6b"
+USER_ID = "0a1b2c3d-4e5f-4a6b-8c7d-9e0f1a2b3c4d"
+
+
+def _service_with_rows(rows: dict, batches: list) -> SupabaseService:
+    async def load_files(user_id, file_ids):
+        batches.append(list(file_ids))
+        # Postgres rejects the whole ANY($1::uuid[]) query if any element is malformed
+        for file_id in file_ids:
+            UUID(file_id)
+        return {file_id: rows[file_id] for file_id in file_ids if file_id in rows}
+
+    service = SupabaseService()
+    service._file_loader = _BatchLoader(load_files)
+    return service
+
+
+def test_malformed_id_does_not_fail_the_batch():
+    batches = []
+    service = _service_with_rows({FILE_ID: {"id": FILE_ID}}, batches)
+
+    async def lookups():
+        return await asyncio.gather(
+            service.get_file_by_id(FILE_ID, USER_ID),
+            service.get_file_by_id("not-a-uuid", USER_ID),
+            return_exceptions=True
+        )
+
+    found, malformed = asyncio.run(lookups())
+
+    assert found == {"id": FILE_ID}
+    assert isinstance(malformed, HTTPException) and malformed.status_code == 404
+    assert batches == [[FILE_ID]]
+
+
+def test_uppercase_id_matches_canonical_row():
+    service = _service_with_rows({FILE_ID: {"id": FILE_ID}}, [])
+
+    assert asyncio.run(service.get_file_by_id(FILE_ID.upper(), USER_ID)) == {"id": FILE_ID}
+
+
+def test_unknown_id_is_not_found():
+    service = _service_with_rows({}, [])
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(service.get_file_by_id(FILE_ID, USER_ID))
+    assert exc_info.value.status_code == 404